@@ -0,0 +1,52 @@
+"""
+Decode time of EyeEm-shaped response bodies: stdlib json, the default
+decoder (orjson when installed) and partial decoding of selected keys,
+plus the memory each result keeps alive.
+
+    python benchmarks/bench_decode.py [items per page]
+"""
+
+import json
+import os
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import eyeem
+import fixtures
+
+
+def per_call(stmt, number):
+    return min(timeit.repeat(stmt, number=number, repeat=5)) / number * 1e6
+
+
+def retained_kb(decode):
+    tracemalloc.start()
+    kept = decode()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return size / 1024.0
+
+
+def main():
+    items = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    for kind in ("photos", "users", "news"):
+        body = fixtures.page_bytes(kind, items)
+        number = max(1, 20000 // items)
+        decoder = eyeem._default_decoder()
+        print("%s page, %d items, %d KB" % (kind, items, len(body) // 1024))
+        scenarios = (
+            ("json.loads", lambda: json.loads(body)),
+            ("default (%s)" % decoder.__module__, lambda: decoder(body)),
+            ("partial %s.items" % kind, lambda: eyeem.decode_partial(body, [kind + ".items"])),
+            ("partial %s.total" % kind, lambda: eyeem.decode_partial(body, [kind + ".total"])),
+        )
+        for name, decode in scenarios:
+            print("  %-22s %9.1f us %9.1f KB kept" % (name, per_call(decode, number), retained_kb(decode)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Memory held by photo and user records kept as the decoded JSON dicts
+versus as eyeem.Photo / eyeem.User records, extrapolated to a million.
+
+    python benchmarks/bench_models.py [records]
+"""
+
+import gc
+import json
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import eyeem
+import fixtures
+
+
+def retained(build):
+    """
+    bytes still allocated by what build() returns
+    """
+    gc.collect()
+    tracemalloc.start()
+    kept = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return size
+
+
+def main():
+    records = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    per_million = 1000000.0 / records
+    for kind, model in (("photos", eyeem.Photo), ("users", eyeem.User)):
+        body = fixtures.page_bytes(kind, records)
+        as_dicts = retained(lambda: json.loads(body)[kind]["items"])
+        as_models = retained(lambda: list(model.iter_items(json.loads(body))))
+        slim = model.only("id", "user_id" if kind == "photos" else "nickname")
+        as_slim = retained(lambda: list(slim.iter_items(json.loads(body))))
+        print("%s per million: dicts %7.1f MB, %s %7.1f MB, %s.only(2 fields) %7.1f MB"
+              % (kind, as_dicts * per_million / 2 ** 20, model.__name__,
+                 as_models * per_million / 2 ** 20, model.__name__,
+                 as_slim * per_million / 2 ** 20))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Cold-start cost of the module: wall time of fresh interpreters that
+import eyeem, construct an API, and make a single get_photo_by_id call
+against the local stub server, next to a bare interpreter as baseline.
+Prints the median and minimum of every scenario in milliseconds as JSON.
+
+    python benchmarks/bench_startup.py [--runs 20] [--path DIR]
+
+--path points at another checkout of eyeem.py to compare against it.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import stub_server
+
+
+SCENARIOS = (
+    ("interpreter", "pass"),
+    ("import", "import eyeem"),
+    ("construct", "import eyeem; eyeem.API('client', 'secret', 'http://localhost/', 'error')"),
+    ("single_call", "import eyeem; api = eyeem.API('client', 'secret', 'http://localhost/', 'error'); "
+                    "api.api_url = %(base_url)r; api.get_photo_by_id(1).json()"),
+)
+
+
+def measure(code, path, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.check_call([sys.executable, "-c", code], cwd=path)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {"median_ms": timings[len(timings) // 2], "min_ms": timings[0]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--path", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+    args = parser.parse_args()
+
+    server, base_url = stub_server.start()
+    path = os.path.abspath(args.path)
+    # one throwaway run, so every measured run finds compiled bytecode
+    subprocess.check_call([sys.executable, "-c", "import eyeem"], cwd=path)
+    results = {"path": path, "runs": args.runs, "scenarios": {}}
+    for name, code in SCENARIOS:
+        results["scenarios"][name] = measure(code % {"base_url": base_url}, path, args.runs)
+    server.shutdown()
+    print(json.dumps(results, indent=2, sort_keys=True))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Throughput and overhead of eyeem.API against the local stub server, for
+sequential, threaded and asyncio usage. The stub runs in a child process,
+so the CPU time reported is the client's alone.
+
+Every scenario cycles through the same mix of calls (photo, album photos,
+user, photo search, news and discover) and reports calls per second, CPU
+milliseconds per call and p50/p95/p99/max latency. Memory per item is the
+peak allocation of fetching and decoding one page, divided by its items.
+Results are printed as JSON, so runs can be stored and compared.
+
+    python benchmarks/bench_suite.py [--calls 2000] [--threads 8] [--concurrency 8]
+                                     [--latency 0.0] [--size 30] [--output results.json]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import eyeem
+import stub_server
+
+
+CALLS = (
+    ("get_photo_by_id", lambda api, i: api.get_photo_by_id(i)),
+    ("album_photos", lambda api, i: api.album_photos(300000 + i % 50)),
+    ("user_by_id", lambda api, i: api.user_by_id(100000 + i % 1000)),
+    ("search_photos", lambda api, i: api.search_photos(q="berlin")),
+    ("news", lambda api, i: api.news(access_token="token")),
+    ("discover", lambda api, i: api.discover()),
+)
+
+
+def client(cls, base_url, **options):
+    api = cls("client", "secret", "http://localhost/", "error", **options)
+    api.api_url = base_url
+    return api
+
+
+def summary(latencies, elapsed, cpu):
+    latencies = sorted(latencies)
+    calls = len(latencies)
+
+    def percentile(q):
+        return latencies[min(calls - 1, int(q * calls))] * 1000
+
+    return {
+        "calls": calls,
+        "calls_per_second": calls / elapsed,
+        "cpu_ms_per_call": cpu * 1000 / calls,
+        "latency_ms": {"p50": percentile(0.5), "p95": percentile(0.95),
+                       "p99": percentile(0.99), "max": latencies[-1] * 1000},
+    }
+
+
+def timed(api, i):
+    start = time.perf_counter()
+    CALLS[i % len(CALLS)][1](api, i).json()
+    return time.perf_counter() - start
+
+
+def sequential(base_url, calls, **unused):
+    api = client(eyeem.API, base_url)
+    timed(api, 0)
+    start, cpu = time.perf_counter(), time.process_time()
+    latencies = [timed(api, i) for i in range(calls)]
+    result = summary(latencies, time.perf_counter() - start, time.process_time() - cpu)
+    api.close()
+    return result
+
+
+def threaded(base_url, calls, threads, **unused):
+    api = client(eyeem.API, base_url)
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(lambda i: timed(api, i), range(threads)))
+        start, cpu = time.perf_counter(), time.process_time()
+        latencies = list(pool.map(lambda i: timed(api, i), range(calls)))
+        result = summary(latencies, time.perf_counter() - start, time.process_time() - cpu)
+    api.close()
+    result["threads"] = threads
+    return result
+
+
+def asynchronous(base_url, calls, concurrency, **unused):
+    async def run():
+        api = client(eyeem.AsyncAPI, base_url)
+        gate = asyncio.Semaphore(concurrency)
+
+        async def one(i):
+            async with gate:
+                start = time.perf_counter()
+                response = await CALLS[i % len(CALLS)][1](api, i)
+                response.json()
+                return time.perf_counter() - start
+
+        await asyncio.gather(*[one(i) for i in range(concurrency)])
+        start, cpu = time.perf_counter(), time.process_time()
+        latencies = await asyncio.gather(*[one(i) for i in range(calls)])
+        result = summary(latencies, time.perf_counter() - start, time.process_time() - cpu)
+        await api.close()
+        return result
+
+    result = asyncio.run(run())
+    result["concurrency"] = concurrency
+    return result
+
+
+def memory(base_url, size, **unused):
+    """
+    peak bytes allocated per item while fetching and decoding one page of photos
+    """
+    api = client(eyeem.API, base_url)
+    api.album_photos(300000, limit=size).json()
+    tracemalloc.start()
+    body = api.album_photos(300000, limit=size).json()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    api.close()
+    items = len(body["photos"]["items"])
+    return {"items": items, "peak_bytes": peak, "bytes_per_item": peak / float(items)}
+
+
+SCENARIOS = (("sequential", sequential), ("threaded", threaded), ("async", asynchronous),
+             ("memory", memory))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.0, help="stub latency in seconds")
+    parser.add_argument("--size", type=int, default=30, help="items per page")
+    parser.add_argument("--output", help="write the JSON results to this file")
+    parser.add_argument("--only", action="append", help="run only these scenarios")
+    args = parser.parse_args()
+
+    process, base_url = stub_server.start_process(latency=args.latency, size=args.size)
+    results = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {"calls": args.calls, "threads": args.threads, "concurrency": args.concurrency,
+                   "latency": args.latency, "size": args.size},
+        "scenarios": {},
+    }
+    try:
+        for name, scenario in SCENARIOS:
+            if args.only and name not in args.only:
+                continue
+            results["scenarios"][name] = scenario(base_url, calls=args.calls, threads=args.threads,
+                                                  concurrency=args.concurrency, size=args.size)
+    finally:
+        process.terminate()
+
+    text = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as output:
+            output.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
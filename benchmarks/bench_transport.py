@@ -0,0 +1,54 @@
+"""
+Calls per second of API.make_request against the local stub server,
+before (one requests.get per call) and after (pooled keep-alive Transport).
+
+    python benchmarks/bench_transport.py [calls]
+"""
+
+import os
+import sys
+import time
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import eyeem
+import stub_server
+
+
+class OneShotTransport(object):
+    """
+    the old behaviour: module-level requests.get, new connection per call
+    """
+    def get(self, url, params=None, headers=None):
+        return requests.get(url, params=params, headers=headers)
+
+    def close(self):
+        pass
+
+
+def run(transport, base_url, calls):
+    api = eyeem.API("client", "secret", "http://localhost/", "error", transport=transport)
+    api.api_url = base_url
+    start = time.time()
+    for _ in range(calls):
+        api.get_popular_photos()
+    elapsed = time.time() - start
+    api.close()
+    return calls / elapsed
+
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    server, base_url = stub_server.start()
+    before = run(OneShotTransport(), base_url, calls)
+    after = run(eyeem.Transport(), base_url, calls)
+    print("before (requests.get):   %8.1f calls/s" % before)
+    print("after  (pooled session): %8.1f calls/s" % after)
+    print("speedup:                 %8.2fx" % (after / before))
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
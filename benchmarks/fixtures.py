@@ -0,0 +1,88 @@
+"""
+EyeEm-shaped payloads for the benchmarks, shaped after responses recorded
+from the v2 API (ids as strings, nested user objects, paged collections).
+"""
+
+import json
+
+
+def user(i):
+    return {
+        "id": str(100000 + i),
+        "nickname": "user%d" % i,
+        "fullname": "Photo Grapher %d" % i,
+        "description": "street and travel photography, mostly film",
+        "thumbUrl": "http://cdn.eyeem.com/thumb/sq/50/%d.jpg" % i,
+        "photoUrl": "http://cdn.eyeem.com/thumb/h/100/%d.jpg" % i,
+        "totalPhotos": i % 500,
+        "totalFollowers": i % 2000,
+        "totalFriends": i % 300,
+        "totalLikedAlbums": i % 40,
+        "totalLikedPhotos": i % 900,
+        "webUrl": "http://www.eyeem.com/u/%d" % (100000 + i),
+    }
+
+
+def photo(i):
+    return {
+        "id": str(5000000 + i),
+        "thumbUrl": "http://cdn.eyeem.com/thumb/sq/200/%d.jpg" % i,
+        "photoUrl": "http://cdn.eyeem.com/thumb/h/1024/%d.jpg" % i,
+        "width": 1024,
+        "height": 768,
+        "updated": "2013-06-%02dT12:%02d:00+0200" % (i % 28 + 1, i % 60),
+        "title": "Sunset over the Spree #%d" % i,
+        "caption": "golden hour at the river #berlin #sunset",
+        "latitude": 52.5 + (i % 100) / 1000.0,
+        "longitude": 13.4 + (i % 100) / 1000.0,
+        "totalLikes": i % 70,
+        "totalComments": i % 9,
+        "totalPeople": 0,
+        "webUrl": "http://www.eyeem.com/p/%d" % (5000000 + i),
+        "user": user(i % 1000),
+        "albums": {"total": 1, "items": [album(i % 50, nested=True)]},
+    }
+
+
+def album(i, nested=False):
+    item = {
+        "id": str(300000 + i),
+        "name": "Berlin %d" % i,
+        "type": "city",
+        "updated": "2013-06-01T10:00:00+0200",
+        "thumbUrl": "http://cdn.eyeem.com/thumb/sq/200/a%d.jpg" % i,
+        "totalPhotos": 1000 + i,
+        "totalContributors": 100 + i,
+        "totalLikers": 10 + i,
+        "webUrl": "http://www.eyeem.com/a/%d" % (300000 + i),
+    }
+    if not nested:
+        item["location"] = {"cityName": "Berlin", "countryName": "Germany", "cc": "DE"}
+    return item
+
+
+def news_item(i):
+    return {
+        "id": str(9000000 + i),
+        "newsType": "like",
+        "updated": "2013-06-01T10:%02d:00+0200" % (i % 60),
+        "seen": i % 2,
+        "user": user(i % 1000),
+        "photo": photo(i),
+    }
+
+
+ITEMS = {"photos": photo, "users": user, "albums": album, "news": news_item}
+
+
+def page(kind, limit=30, offset=0, total=None):
+    """
+    a paged response body, e.g. page("photos", 30) for {"photos": {..., "items": [30 photos]}}
+    """
+    total = offset + limit if total is None else total
+    items = [ITEMS[kind](i) for i in range(offset, min(offset + limit, total))]
+    return {kind: {"offset": offset, "limit": limit, "total": total, "items": items}}
+
+
+def page_bytes(kind, limit=30, offset=0, total=None):
+    return json.dumps(page(kind, limit, offset, total)).encode("utf-8")
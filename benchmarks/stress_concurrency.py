@@ -0,0 +1,67 @@
+"""
+Concurrency stress test: one API instance shared by a pool of worker
+threads. Every call sends its own parameters, and the stub server echoes
+the query string back, so any parameter leaking from one call into
+another is detected.
+
+    python benchmarks/stress_concurrency.py [workers] [calls per worker]
+"""
+
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from urllib.parse import parse_qsl
+except ImportError:
+    from urlparse import parse_qsl
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import eyeem
+import stub_server
+
+
+def worker(api, worker_id, calls):
+    """
+    returns the number of calls whose echoed parameters differ from what was sent
+    """
+    errors = 0
+    for seq in range(calls):
+        if seq % 3 == 0:
+            response = api.collections()
+            expected = {"client_id": "client"}
+        elif seq % 3 == 1:
+            response = api.get_photo_by_id(seq, detailed=worker_id, numLikers=seq)
+            expected = {"client_id": "client", "detailed": str(worker_id), "numLikers": str(seq)}
+        else:
+            token = "token-%d-%d" % (worker_id, seq)
+            response = api.user_followers(worker_id, limit=seq, access_token=token)
+            expected = {"client_id": "client", "limit": str(seq), "access_token": token}
+        if dict(parse_qsl(response.headers["X-Echo-Query"])) != expected:
+            errors += 1
+    return errors
+
+
+def main():
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    calls = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    server, base_url = stub_server.start()
+    api = eyeem.API("client", "secret", "http://localhost/", "error",
+                    transport=eyeem.Transport(pool_maxsize=workers))
+    api.api_url = base_url
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        errors = sum(pool.map(lambda i: worker(api, i, calls), range(workers)))
+    elapsed = time.time() - start
+    api.close()
+    server.shutdown()
+    print("%d workers x %d calls in %.1fs, %d leaked parameter sets"
+          % (workers, calls, elapsed, errors))
+    if errors or dict(api.base_payload) != {"client_id": "client"}:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+A local stub of the EyeEm API used by the benchmarks.
+
+Serves EyeEm-shaped JSON bodies (see fixtures.py) for the photos, albums,
+users, search, news and discover paths over HTTP/1.1 keep-alive, so the
+numbers measure the client and not the network. Every response can be
+delayed by a fixed latency, and paged responses carry `size` items unless
+the request asks for a smaller limit. The raw query string of every
+request is echoed in the X-Echo-Query header.
+
+    python benchmarks/stub_server.py [port] [latency seconds] [page size]
+"""
+
+import json
+import re
+import sys
+import threading
+import time
+
+try:
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from urllib.parse import parse_qsl
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urlparse import parse_qsl
+
+    class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+        daemon_threads = True
+
+import fixtures
+
+
+BODY = json.dumps({"photos": {"offset": 0, "limit": 1, "total": 1,
+                              "items": [{"id": "1", "title": "stub"}]}}).encode("utf-8")
+
+# collection name of the last path segment, for users/1/followers and the like
+COLLECTIONS = {
+    "photos": "photos", "popular": "photos", "likedPhotos": "photos",
+    "albums": "albums", "likedAlbums": "albums",
+    "users": "users", "followers": "users", "friends": "users", "likers": "users",
+    "contributors": "users", "favoriters": "users",
+    "news": "news",
+}
+
+ENTITIES = {"photos": ("photo", fixtures.photo), "albums": ("album", fixtures.album),
+            "users": ("user", fixtures.user), "news": ("newsItem", fixtures.news_item)}
+
+
+def route(path, query, size, total):
+    """
+    the response body for a request path (without /v2/) and its query parameters
+    """
+    segments = [segment for segment in path.strip("/").split("/") if segment][1:]
+    limit = min(int(query.get("limit", size)), size)
+    offset = int(query.get("offset", 0))
+    if not segments:
+        return None
+    if segments[0] == "search":
+        kinds = ["photos"] if segments[-1] == "photos" else (
+            ["albums"] if segments[-1] == "albums" else ["users", "albums"])
+        body = {}
+        for kind in kinds:
+            body.update(fixtures.page(kind, limit, offset, total))
+        return body
+    if segments[0] == "discover":
+        items = [{"type": "album", "album": fixtures.album(i)} if i % 3 == 0 else
+                 {"type": "photo", "photo": fixtures.photo(i)}
+                 for i in range(offset, min(offset + limit, total))]
+        return {"discover": {"offset": offset, "limit": limit, "total": total, "items": items}}
+    if len(segments) == 2 and segments[0] in ENTITIES and re.match(r"^\d+$", segments[1]):
+        key, make = ENTITIES[segments[0]]
+        return {key: make(int(segments[1]) % 100000)}
+    kind = COLLECTIONS.get(segments[-1])
+    if kind is None:
+        return None
+    return fixtures.page(kind, limit, offset, total)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        path, _, query = self.path.partition("?")
+        server = self.server
+        key = (path, query)
+        body = server.bodies.get(key)
+        if body is None:
+            routed = route(path, dict(parse_qsl(query)), server.size, server.total)
+            body = BODY if routed is None else json.dumps(routed).encode("utf-8")
+            if len(server.bodies) < 10000:
+                server.bodies[key] = body
+        if server.latency:
+            time.sleep(server.latency)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("X-Echo-Query", query)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def create(host="127.0.0.1", port=0, latency=0.0, size=30, total=1000):
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.size = size
+    server.total = total
+    server.bodies = {}
+    return server
+
+
+def start(host="127.0.0.1", port=0, latency=0.0, size=30, total=1000):
+    """
+    starts the stub server in a daemon thread, returns (server, base_url)
+    """
+    server = create(host, port, latency, size, total)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server, "http://%s:%d" % server.server_address
+
+
+def _serve(connection, host, latency, size, total):
+    server = create(host, 0, latency, size, total)
+    connection.send("http://%s:%d" % server.server_address)
+    server.serve_forever()
+
+
+def start_process(host="127.0.0.1", latency=0.0, size=30, total=1000):
+    """
+    starts the stub server in a child process, so its CPU time is not
+    counted against the client; returns (process, base_url)
+    """
+    import multiprocessing
+    parent, child = multiprocessing.Pipe()
+    process = multiprocessing.Process(target=_serve, args=(child, host, latency, size, total))
+    process.daemon = True
+    process.start()
+    return process, parent.recv()
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    server = create(port=int(args[0]) if args else 8765,
+                    latency=float(args[1]) if len(args) > 1 else 0.0,
+                    size=int(args[2]) if len(args) > 2 else 30)
+    print("stub EyeEm API listening on http://%s:%d" % server.server_address)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -9,8 +9,24 @@ Documentation at https://github.com/hoff/eyepy
 __author__ = 'micklinghoff@gmail.com'
 __version__ = '0.1'
 
-import requests
 import logging
+import base64
+import codecs
+import json
+import os
+import random
+import re
+import threading
+import time
+import zlib
+from bisect import bisect_left
+from collections import OrderedDict, deque
+from collections.abc import MutableMapping
+from itertools import count
+from types import MappingProxyType
+from concurrent.futures import (FIRST_COMPLETED, BrokenExecutor, Future, ThreadPoolExecutor,
+                                TimeoutError as FutureTimeout, wait)
+from urllib.parse import urlencode
 
 log_levels = {
     "debug": logging.DEBUG,
@@ -20,20 +36,1733 @@ log_levels = {
     "critical": logging.CRITICAL
 }
 logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+
+class _LazyModule(object):
+    """
+    a standard library module imported on first use, so that importing
+    eyeem stays cheap for clients that never need it
+    """
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = __import__(self._name)
+        value = getattr(self._module, attr)
+        setattr(self, attr, value)
+        return value
+
+
+asyncio = _LazyModule("asyncio")
+hashlib = _LazyModule("hashlib")
+sqlite3 = _LazyModule("sqlite3")
 
 API_URL = "https://api.eyeem.com"
 API_VERSION = "v2"
+PAGE_LIMIT = 30
+MAX_URL_LENGTH = 2000
+STREAM_CHUNK_SIZE = 16384
+BATCH_SIZE = 100
+MEMBERSHIP_LIMIT = 100
+
+# seconds a response stays cached, by endpoint (numeric path segments are %d)
+CACHE_TTLS = {
+    "photos/popular": 300,
+    "collections": 60,
+    "topics": 3600,
+    "albums/%d/weather": 900,
+    "albums/%d/venueCategories": 3600,
+}
+
+_numeric_segment = re.compile(r"(?<=/)\d+(?=/|$)")
+_path_id = re.compile(r"\{(\w+)\}")
+
+
+def _endpoint(path):
+    """
+    maps a resource path to its endpoint, e.g. "/albums/123/weather" to "albums/%d/weather"
+    """
+    return _numeric_segment.sub("%d", "/" + path.strip("/"))[1:]
+
+
+def _request_key(path, payload):
+    """
+    path plus the sorted payload, which includes client_id and access_token
+    """
+    return "%s?%s" % (path.strip("/"), urlencode(sorted(payload.items())))
+
+
+def _page(body):
+    """
+    returns (items, limit, total) of the first paged collection in a response body,
+    e.g. body["photos"] for {"photos": {"offset": 0, "limit": 30, "total": 95, "items": [...]}}
+    """
+    for value in body.values():
+        if isinstance(value, dict) and 'items' in value:
+            return value['items'], value.get('limit'), value.get('total')
+    return [], None, None
+
+
+def _last_page(items, page_limit, limit, offset, total):
+    """
+    whether iteration stops after a page: it is short, or offset reached the total
+    """
+    return len(items) < (page_limit or limit) or (total is not None and offset >= total)
+
+
+def _default_decoder():
+    """
+    orjson.loads when orjson is installed, json.loads otherwise
+    """
+    try:
+        import orjson
+        return orjson.loads
+    except ImportError:
+        return json.loads
+
+
+_json_scanner = json.JSONDecoder()
+_whitespace = re.compile(r"[ \t\n\r]*")
+_scalar = re.compile(r'[^,}\]\s]*')
+
+
+def _path_tree(paths):
+    """
+    ("photos.items", "photos.total") -> {"photos": {"items": None, "total": None}},
+    None marking a value that is decoded whole
+    """
+    tree = {}
+    for path in paths:
+        node = tree
+        keys = path.split(".")
+        for key in keys[:-1]:
+            node = node.setdefault(key, {})
+            if node is None:
+                break
+        else:
+            node[keys[-1]] = None
+    return tree
+
+
+def _skip_value(text, idx):
+    """
+    returns the index after the JSON value starting at idx, dropping the value.
+    Containers go through the C scanner, which is faster than any
+    pure-Python skipping, and are freed right away.
+    """
+    if text[idx] in '{["':
+        return _json_scanner.raw_decode(text, idx)[1]
+    return _scalar.match(text, idx).end()
+
+
+def _decode_object(text, idx, tree):
+    """
+    decodes the object starting at idx, keeping only the keys in tree.
+    returns (object, index after it)
+    """
+    result = {}
+    idx = _whitespace.match(text, idx + 1).end()
+    if text[idx] == "}":
+        return result, idx + 1
+    while True:
+        key, idx = json.decoder.scanstring(text, idx + 1)
+        idx = _whitespace.match(text, idx).end() + 1 # past the colon
+        idx = _whitespace.match(text, idx).end()
+        if key not in tree:
+            idx = _skip_value(text, idx)
+        elif tree[key] is None or text[idx] != "{":
+            result[key], idx = _json_scanner.raw_decode(text, idx)
+        else:
+            result[key], idx = _decode_object(text, idx, tree[key])
+        idx = _whitespace.match(text, idx).end()
+        if text[idx] == "}":
+            return result, idx + 1
+        idx = _whitespace.match(text, idx + 1).end() # past the comma
+
+
+def decode_partial(body, paths):
+    """
+    Decodes only the given dotted key paths of a JSON object, e.g.
+    decode_partial(body, ["photos.items"]) -> {"photos": {"items": [...]}}.
+    Everything else is dropped as soon as it is scanned, so only the
+    requested parts of a large body stay in memory.
+    """
+    if isinstance(body, bytes):
+        body = body.decode("utf-8")
+    idx = _whitespace.match(body, 0).end()
+    return _decode_object(body, idx, _path_tree(paths))[0]
+
+
+_separators = re.compile(r"[ \t\n\r,]*")
+# what may follow a complete number or literal inside an array
+_scalar_ends = frozenset(", \t\r\n]")
+
+
+class ItemParser(object):
+    """
+    Incremental parser for the items array of a paged response body.
+    Feed it chunks as they arrive, it returns the items completed so far.
+    Only the unfinished item is buffered, so memory stays bounded by one
+    item and one chunk whatever the size of the page.
+
+    Optional arguments:
+        key = "items" (the first array under this key is the one streamed)
+    """
+    def __init__(self, key="items"):
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._start = re.compile(r'"%s"\s*:\s*\[' % re.escape(key))
+        self._buffer = ""
+        self.started = False
+        self.done = False
+
+    def feed(self, chunk):
+        self._buffer += self._decoder.decode(chunk)
+        items = []
+        if not self.started:
+            match = self._start.search(self._buffer)
+            if match is None:
+                self._buffer = self._buffer[-256:] # keep a key split across chunks
+                return items
+            self.started = True
+            self._buffer = self._buffer[match.end():]
+        buffer, pos = self._buffer, 0
+        while not self.done:
+            pos = _separators.match(buffer, pos).end()
+            if pos == len(buffer):
+                break
+            if buffer[pos] == "]":
+                self.done = True
+                break
+            try:
+                item, end = _json_scanner.raw_decode(buffer, pos)
+            except ValueError:
+                break # incomplete, wait for the next chunk
+            if not isinstance(item, (dict, list, str)) and buffer[end:end + 1] not in _scalar_ends:
+                break # a number or literal may go on in the next chunk
+            items.append(item)
+            pos = end
+        self._buffer = "" if self.done else buffer[pos:]
+        return items
+
+    def close(self):
+        """
+        checks that the body did not end in the middle of the array
+        """
+        if self.started and not self.done:
+            raise ValueError("response body ended inside the items array")
+
+
+# parts of the hydrate_* calls: part -> endpoint method, called with the object's id
+PHOTO_PARTS = {
+    "photo": "get_photo_by_id",
+    "likers": "get_photo_likers",
+    "comments": "get_photo_comments",
+    "people": "get_tagged_in_photo",
+    "albums": "get_photos_album",
+}
+ALBUM_PARTS = {
+    "album": "get_album_by_id",
+    "contributors": "album_contributors",
+    "favoriters": "album_favoriters",
+    "related": "related_albums",
+}
+USER_PARTS = {
+    "user": "user_by_id",
+    "photos": "user_photos",
+    "followers": "user_followers",
+    "friends": "user_friends",
+    "favorite_albums": "user_favorite_albums",
+    "topics": "user_topics",
+}
+
+
+# endpoints the mirror can answer: endpoint -> entity kind
+MIRRORED_ENDPOINTS = {
+    "photos/%d": "photo",
+    "albums/%d": "album",
+    "users/%d": "user",
+}
+
+# response keys holding entities: key -> entity kind
+ENTITY_KEYS = {
+    "photo": "photo", "photos": "photo",
+    "album": "album", "albums": "album",
+    "user": "user", "users": "user", "likers": "user", "friends": "user",
+    "followers": "user", "contributors": "user", "favoriters": "user",
+}
+
+
+def _unwrap(body):
+    """
+    {"photo": {...}} -> {...}, bodies with several keys are kept whole
+    """
+    if isinstance(body, dict) and len(body) == 1:
+        return next(iter(body.values()))
+    return body
+
+
+def _dedupe(ids):
+    """
+    ids without repetitions, in first-seen order
+    """
+    seen = set()
+    unique = []
+    for i in ids:
+        if str(i) not in seen:
+            seen.add(str(i))
+            unique.append(i)
+    return unique
+
+
+def _member_ids(pages):
+    """
+    the ids of listed items as strings, whether they came as ids (onlyId=1) or objects
+    """
+    return set(str(item['id'] if isinstance(item, dict) else item) for items in pages for item in items)
+
+
+def _member_params(kwargs, offset):
+    """
+    parameters of one page of an id listing
+    """
+    return dict(kwargs, onlyId=1, limit=MEMBERSHIP_LIMIT, offset=offset)
+
+
+def _existing(ids, answers):
+    """
+    the ids answered True by one existence check each, as strings
+    """
+    return set(str(i) for i, exists in zip(ids, answers) if exists)
+
+
+def _found(ids, batches):
+    """
+    merges the {id: item} dicts of the batches, returns (found, ids missing from all of them)
+    """
+    found = {}
+    for items in batches:
+        found.update(items)
+    return found, [i for i in ids if str(i) not in found]
+
+
+def _in_order(ids, found, missing, singles):
+    """
+    the items of ids in their order, the ones fetched singly filled in for the missing ids
+    """
+    found.update(zip((str(i) for i in missing), singles))
+    return [found.get(str(i)) for i in ids]
+
+
+def _iterator(endpoint):
+    """
+    builds the iter_<endpoint> variant of a limit/offset paged endpoint
+    """
+    def iterate(self, *args, **kwargs):
+        return self._iterate(getattr(self, endpoint), args, kwargs)
+    iterate.__name__ = "iter_%s" % endpoint
+    iterate.__doc__ = """
+        Lazily yields every item of %s, page by page.
+        The next page is fetched in the background while the current one is consumed,
+        iteration stops on a short or empty page. A page that fails raises APIError.
+
+        Takes the same arguments as %s, limit is the page size (default %d)
+        and offset the position to start from.
+        """ % (endpoint, endpoint, PAGE_LIMIT)
+    return iterate
+
+
+class Endpoint(object):
+    """
+    Declares one resource of the API. The API method (and its iter_ and
+    stream_ variants) is generated from it once, at import time, with the
+    path template compiled into the method: a call formats the ids into the
+    path and hands the keyword arguments on as the payload, nothing else.
+
+    Required arguments:
+        name (of the method)
+        path (template such as "photos/{photo_id}/likers")
+
+    Optional arguments:
+        args = None (positional arguments of the method, the path ids in order by default)
+        returns = "response" ("json" for the decoded body, "exists" for True on 200)
+        options = True (the method takes optional query parameters as keywords)
+        required = () (query parameters the method requires as keywords)
+        defaults = None (dict of query parameters sent unless given)
+        paging = None ("offset" adds an iter_<name> variant)
+        stream = None (what the items are, adds a stream_<name> variant)
+        doc = None (docstring of the method)
+    """
+    RETURNS = {"response": "make_request", "json": "_request_json", "exists": "_request_exists"}
+
+    def __init__(self, name, path, args=None, returns="response", options=True, required=(),
+                 defaults=None, paging=None, stream=None, doc=None):
+        self.name = name
+        self.path = path
+        self.ids = tuple(_path_id.findall(path))
+        self.args = tuple(args) if args is not None else self.ids
+        self.template = _path_id.sub("%d", path)
+        self.returns = returns
+        self.options = options
+        self.required = tuple(required)
+        self.defaults = defaults
+        self.paging = paging
+        self.stream = stream
+        self.doc = doc
+
+    def _compile(self, name, call, doc):
+        """
+        builds a function whose signature and body are specific to this endpoint
+        """
+        signature = ["self"] + list(self.args)
+        if self.required:
+            signature += ["*"] + list(self.required)
+        if self.options:
+            signature.append("**kwargs")
+        body = []
+        if self.required and not self.options:
+            body.append("kwargs = {}")
+        for key in self.required:
+            body.append("kwargs[%r] = %s" % (key, key))
+        if self.defaults:
+            payload = "dict(DEFAULTS, **kwargs)" if self.options or self.required else "dict(DEFAULTS)"
+        else:
+            payload = "kwargs" if self.options or self.required else "{}"
+        path = repr(self.template)
+        if self.ids:
+            path = "%s %% (%s,)" % (path, ", ".join("int(%s)" % key for key in self.ids))
+        body.append("return self.%s(%s, %s)" % (call, path, payload))
+        source = "def %s(%s):\n    %s\n" % (name, ", ".join(signature), "\n    ".join(body))
+        namespace = {"DEFAULTS": self.defaults}
+        exec(source, namespace)
+        function = namespace[name]
+        function.__doc__ = doc
+        function.__module__ = __name__
+        function.__qualname__ = "API.%s" % name
+        return function
+
+    def method(self):
+        return self._compile(self.name, self.RETURNS[self.returns], self.doc)
+
+    def streamer(self):
+        return self._compile("stream_%s" % self.name, "stream_items", """
+        Streaming variant of %s: yields %s as the body arrives.
+        Takes the same arguments as %s.
+        """ % (self.name, self.stream, self.name))
+
+
+def _install(cls, endpoints):
+    """
+    adds the methods generated from the endpoint table to cls
+    """
+    for endpoint in endpoints:
+        setattr(cls, endpoint.name, endpoint.method())
+        if endpoint.paging == "offset":
+            iterate = _iterator(endpoint.name)
+            iterate.__qualname__ = "%s.%s" % (cls.__name__, iterate.__name__)
+            setattr(cls, iterate.__name__, iterate)
+        if endpoint.stream is not None:
+            setattr(cls, "stream_%s" % endpoint.name, endpoint.streamer())
+
+
+class Transport(object):
+    """
+    Pooled keep-alive HTTP transport.
+
+    One transport is owned by each API instance, so consecutive calls reuse
+    open TCP/TLS connections instead of doing a new handshake every time.
+
+    Optional arguments:
+        pool_connections = 10 (number of hosts to keep a pool for)
+        pool_maxsize = 10 (connections kept open per host)
+        connect_timeout = 5.0 (seconds)
+        read_timeout = 30.0 (seconds)
+        keep_alive = True
+        http2 = False (requires httpx with the http2 extra)
+    """
+    def __init__(self, pool_connections=10, pool_maxsize=10, connect_timeout=5.0,
+                 read_timeout=30.0, keep_alive=True, http2=False):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.keep_alive = keep_alive
+        self.http2 = http2
+        self._session = None
+        self._errors = ()
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        """
+        the pooled session, created on first use: requests (or httpx) is
+        only imported when the first request is sent
+        """
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    session = self._httpx_client() if self.http2 else self._requests_session()
+                    if not self.keep_alive:
+                        session.headers['Connection'] = 'close'
+                    self._session = session
+        return self._session
+
+    @property
+    def errors(self):
+        """
+        the exceptions of the session that are transport failures
+        """
+        self.session
+        return self._errors
+
+    def _requests_session(self):
+        import requests
+        self._errors = (requests.ConnectionError, requests.Timeout)
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def _httpx_client(self):
+        try:
+            import httpx
+        except ImportError:
+            raise ImportError("http2=True requires httpx[http2] (pip install 'httpx[http2]')")
+        self._errors = (httpx.TransportError,)
+        return httpx.Client(
+            http2=True,
+            limits=httpx.Limits(max_connections=self.pool_connections * self.pool_maxsize,
+                                max_keepalive_connections=self.pool_maxsize),
+            timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout))
+
+    def get(self, url, params=None, headers=None):
+        """
+        performs a GET request on the pooled session
+        """
+        if self.http2:
+            return self.session.get(url, params=params, headers=headers)
+        return self.session.get(url, params=params, headers=headers,
+                                timeout=(self.connect_timeout, self.read_timeout))
+
+    def stream(self, url, params=None, headers=None, chunk_size=STREAM_CHUNK_SIZE):
+        """
+        performs a GET request and yields the body in chunks as they arrive,
+        raises APIError for a status other than 200
+        """
+        if self.http2:
+            with self.session.stream("GET", url, params=params, headers=headers) as response:
+                if response.status_code != 200:
+                    raise APIError(response)
+                for chunk in response.iter_bytes(chunk_size):
+                    yield chunk
+            return
+        response = self.session.get(url, params=params, headers=headers, stream=True,
+                                    timeout=(self.connect_timeout, self.read_timeout))
+        try:
+            if response.status_code != 200:
+                raise APIError(response)
+            for chunk in response.iter_content(chunk_size):
+                yield chunk
+        finally:
+            response.close()
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
+
+
+class AsyncTransport(object):
+    """
+    Pooled keep-alive HTTP transport for asyncio, backed by httpx.AsyncClient.
+
+    Thousands of concurrent requests share one event loop and one
+    connection pool instead of a thread per request.
+
+    Optional arguments:
+        max_connections = 100 (open connections across all hosts)
+        max_keepalive = 20 (idle connections kept open)
+        connect_timeout = 5.0 (seconds)
+        read_timeout = 30.0 (seconds)
+        http2 = False
+    """
+    def __init__(self, max_connections=100, max_keepalive=20, connect_timeout=5.0,
+                 read_timeout=30.0, http2=False):
+        try:
+            import httpx
+        except ImportError:
+            raise ImportError("AsyncTransport requires httpx (pip install httpx)")
+        self.errors = (httpx.TransportError,)
+        self.session = httpx.AsyncClient(
+            http2=http2,
+            limits=httpx.Limits(max_connections=max_connections,
+                                max_keepalive_connections=max_keepalive),
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout))
+
+    async def get(self, url, params=None, headers=None):
+        """
+        performs a GET request on the pooled async client
+        """
+        return await self.session.get(url, params=params, headers=headers)
+
+    async def stream(self, url, params=None, headers=None, chunk_size=STREAM_CHUNK_SIZE):
+        """
+        performs a GET request and yields the body in chunks as they arrive,
+        raises APIError for a status other than 200
+        """
+        async with self.session.stream("GET", url, params=params, headers=headers) as response:
+            if response.status_code != 200:
+                raise APIError(response)
+            async for chunk in response.aiter_bytes(chunk_size):
+                yield chunk
+
+    async def close(self):
+        await self.session.aclose()
+
+
+class APIError(Exception):
+    """
+    raised for a response that is not 200
+    """
+    def __init__(self, response):
+        Exception.__init__(self, "%s returned %s" % (response.url, response.status_code))
+        self.status_code = response.status_code
+        self.url = response.url
+
+    def __reduce__(self):
+        # rebuilt from a bodiless response, so it survives crossing process boundaries
+        return (APIError, (StoredResponse(self.url, self.status_code, {}, b""),))
+
+
+class _Headers(MutableMapping):
+    """
+    case-insensitive header mapping of a stored response, like the live
+    responses of requests and httpx; keeps the names as they were given
+    """
+    __slots__ = ('_items',)
+
+    def __init__(self, headers=None):
+        self._items = {}
+        if headers:
+            for name, value in headers.items():
+                self._items[name.lower()] = (name, value)
+
+    def __getitem__(self, name):
+        return self._items[name.lower()][1]
+
+    def __setitem__(self, name, value):
+        self._items[name.lower()] = (name, value)
+
+    def __delitem__(self, name):
+        del self._items[name.lower()]
+
+    def __iter__(self):
+        return (name for name, _ in self._items.values())
+
+    def __len__(self):
+        return len(self._items)
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+
+class StoredResponse(object):
+    """
+    A response detached from its connection, as served from a cache.
+    Offers the parts of requests.Response the endpoints use, headers are
+    looked up case-insensitively as on a live response.
+    """
+    def __init__(self, url, status_code, headers, content):
+        self.url = url
+        self.status_code = status_code
+        self.headers = _Headers(headers)
+        self.content = content
+
+    @classmethod
+    def from_response(cls, response):
+        return cls(str(response.url), response.status_code, dict(response.headers), response.content)
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8")
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class SharedResponse(StoredResponse):
+    """
+    A stored response handed to several coalesced callers: the body is
+    decoded once and every caller gets the same parsed object.
+    """
+    def __init__(self, url, status_code, headers, content):
+        StoredResponse.__init__(self, url, status_code, headers, content)
+        self._parsed = None
+        self._lock = threading.Lock()
+
+    def json(self):
+        with self._lock:
+            if self._parsed is None:
+                self._parsed = json.loads(self.content)
+            return self._parsed
+
+
+CASSETTE_MAGIC = b"EYEEM-CASSETTE 1\n"
+CASSETTE_HEADERS = ("content-type", "etag", "last-modified", "cache-control", "retry-after",
+                    "x-ratelimit-limit", "x-ratelimit-remaining", "x-ratelimit-reset")
+
+
+def _cassette_key(url, params, ignore):
+    """
+    url plus the sorted parameters, without the ignored ones (client_id, access_token)
+    """
+    return (url, tuple(sorted((key, str(value)) for key, value in (params or {}).items()
+                              if key not in ignore)))
+
+
+class ReplayError(IOError):
+    """
+    transport failure injected by ReplayTransport
+    """
+
+
+class RecordingTransport(object):
+    """
+    Wraps a transport and appends every response it returns to a cassette
+    file, for ReplayTransport to serve later. A cassette is a sequence of
+    records, each a 4-byte length, a small JSON header (url, parameters,
+    status, the headers the client reads, elapsed time) and the body,
+    zlib-compressed when that makes it smaller.
+
+    Required arguments:
+        path (cassette file, appended to if it exists)
+
+    Optional arguments:
+        transport = Transport()
+        ignore = ("client_id", "access_token") (parameters not recorded: replays match any value)
+
+    Streamed bodies (stream_items) are recorded once they have been read to
+    the end, as a 200 without headers.
+
+        api = eyeem.API(..., transport=eyeem.RecordingTransport("eyeem.cassette"))
+    """
+    def __init__(self, path, transport=None, ignore=("client_id", "access_token")):
+        self.path = path
+        self.transport = transport or Transport()
+        self.ignore = ignore
+        self.recorded = 0
+        self._lock = threading.Lock()
+        self._file = open(path, "ab")
+        if self._file.tell() == 0:
+            self._file.write(CASSETTE_MAGIC)
+
+    @property
+    def errors(self):
+        return getattr(self.transport, 'errors', ())
+
+    def get(self, url, params=None, headers=None):
+        start = time.perf_counter()
+        response = self.transport.get(url, params=params, headers=headers)
+        self._record(url, params, response, time.perf_counter() - start)
+        return response
+
+    def stream(self, url, params=None, headers=None, chunk_size=STREAM_CHUNK_SIZE):
+        start = time.perf_counter()
+        chunks = []
+        stream = self.transport.stream(url, params=params, headers=headers, chunk_size=chunk_size)
+        try:
+            for chunk in stream:
+                chunks.append(chunk)
+                yield chunk
+        except GeneratorExit:
+            # the reader stops at the end of the items array, the rest of the body is recorded too
+            chunks.extend(stream)
+            self._record_stream(url, params, chunks, start)
+            raise
+        self._record_stream(url, params, chunks, start)
+
+    def _record_stream(self, url, params, chunks, start):
+        self._record(url, params, StoredResponse(url, 200, {}, b"".join(chunks)),
+                     time.perf_counter() - start)
+
+    def _record(self, url, params, response, elapsed):
+        body = response.content
+        packed = zlib.compress(body)
+        compressed = len(packed) < len(body)
+        header = json.dumps({
+            "key": _cassette_key(url, params, self.ignore),
+            "status": response.status_code,
+            "headers": dict((name, value) for name, value in response.headers.items()
+                            if name.lower() in CASSETTE_HEADERS),
+            "elapsed": round(elapsed, 4),
+            "size": len(packed) if compressed else len(body),
+            "z": compressed,
+        }, separators=(",", ":")).encode("utf-8")
+        with self._lock:
+            self._file.write(len(header).to_bytes(4, "big"))
+            self._file.write(header)
+            self._file.write(packed if compressed else body)
+            self.recorded += 1
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+        self.transport.close()
+
+
+class AsyncRecordingTransport(RecordingTransport):
+    """
+    RecordingTransport for AsyncAPI, wraps an AsyncTransport
+
+        api = eyeem.AsyncAPI(..., transport=eyeem.AsyncRecordingTransport("eyeem.cassette"))
+    """
+    def __init__(self, path, transport=None, ignore=("client_id", "access_token")):
+        RecordingTransport.__init__(self, path, transport or AsyncTransport(), ignore)
+
+    async def get(self, url, params=None, headers=None):
+        start = time.perf_counter()
+        response = await self.transport.get(url, params=params, headers=headers)
+        self._record(url, params, response, time.perf_counter() - start)
+        return response
+
+    async def stream(self, url, params=None, headers=None, chunk_size=STREAM_CHUNK_SIZE):
+        start = time.perf_counter()
+        chunks = []
+        stream = self.transport.stream(url, params=params, headers=headers, chunk_size=chunk_size)
+        try:
+            async for chunk in stream:
+                chunks.append(chunk)
+                yield chunk
+        except GeneratorExit:
+            # the reader stops at the end of the items array, the rest of the body is recorded too
+            async for chunk in stream:
+                chunks.append(chunk)
+            self._record_stream(url, params, chunks, start)
+            raise
+        self._record_stream(url, params, chunks, start)
+
+    async def close(self):
+        with self._lock:
+            self._file.close()
+        await self.transport.close()
+
+
+def read_cassette(path):
+    """
+    yields (key, status, headers, elapsed, body) for every record of a cassette
+    """
+    with open(path, "rb") as cassette:
+        data = cassette.read()
+    if not data.startswith(CASSETTE_MAGIC):
+        raise ValueError("%s is not a cassette" % path)
+    position = len(CASSETTE_MAGIC)
+    while position < len(data):
+        length = int.from_bytes(data[position:position + 4], "big")
+        header = json.loads(data[position + 4:position + 4 + length])
+        position += 4 + length
+        body = data[position:position + header["size"]]
+        position += header["size"]
+        if header["z"]:
+            body = zlib.decompress(body)
+        url, params = header["key"]
+        yield ((url, tuple(tuple(pair) for pair in params)), header["status"], header["headers"],
+               header["elapsed"], body)
+
+
+class ReplayTransport(object):
+    """
+    Serves the responses of a cassette written by RecordingTransport, without
+    network access. The cassette is loaded and indexed once, a request is a
+    dict lookup, so replay keeps up with load tests of any size. Requests
+    recorded several times are answered with their recordings in turn.
+
+    Required arguments:
+        path (cassette file)
+
+    Optional arguments:
+        latency = 0.0 (seconds added to every request, "recorded" for the recorded times)
+        jitter = 0.0 (up to this many seconds added at random)
+        bandwidth = None (bytes per second the bodies are delivered at)
+        error_rate = 0.0 (fraction of requests that fail)
+        error_status = 503 (status of failed requests, None to raise ReplayError instead)
+        ignore = ("client_id", "access_token") (parameters ignored when matching)
+        seed = None (for a reproducible sequence of injected errors and jitter)
+
+    A request missing from the cassette raises KeyError.
+
+        api = eyeem.API(..., transport=eyeem.ReplayTransport("eyeem.cassette", latency=0.05,
+                                                              error_rate=0.01))
+    """
+    errors = (ReplayError,)
+
+    def __init__(self, path, latency=0.0, jitter=0.0, bandwidth=None, error_rate=0.0,
+                 error_status=503, ignore=("client_id", "access_token"), seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.ignore = ignore
+        self.replayed = 0
+        self.injected_errors = 0
+        self._random = random.Random(seed)
+        self._index = {}
+        for key, status, headers, elapsed, body in read_cassette(path):
+            response = StoredResponse(key[0], status, headers, body)
+            response.elapsed = elapsed
+            self._index.setdefault(key, []).append(response)
+        for key, responses in self._index.items():
+            # single recordings are served directly, repeated ones in turn
+            self._index[key] = responses[0] if len(responses) == 1 else (responses, count())
+
+    def __len__(self):
+        return len(self._index)
+
+    def _lookup(self, url, params):
+        key = _cassette_key(url, params, self.ignore)
+        entry = self._index.get(key)
+        if entry is None:
+            raise KeyError("no recorded response for %s %r" % (url, key[1]))
+        self.replayed += 1
+        if isinstance(entry, StoredResponse):
+            return entry
+        responses, turns = entry
+        return responses[next(turns) % len(responses)]
+
+    def _latency(self, response):
+        latency = response.elapsed if self.latency == "recorded" else self.latency
+        if self.jitter:
+            latency += self._random.uniform(0, self.jitter)
+        return latency
+
+    def _fail(self, url):
+        """
+        the injected failure for this request, if any
+        """
+        if not self.error_rate or self._random.random() >= self.error_rate:
+            return None
+        self.injected_errors += 1
+        if self.error_status is None:
+            raise ReplayError("injected failure for %s" % url)
+        return StoredResponse(url, self.error_status, {}, b"")
+
+    def _reply(self, url, params):
+        """
+        (response, seconds it takes) under the configured profile
+        """
+        response = self._lookup(url, params)
+        delay = self._latency(response)
+        if self.bandwidth:
+            delay += len(response.content) / float(self.bandwidth)
+        return self._fail(url) or response, delay
+
+    def _chunks(self, url, params, chunk_size):
+        """
+        (latency, [(seconds, chunk)]) of a streamed response
+        """
+        response = self._lookup(url, params)
+        failed = self._fail(url)
+        if (failed or response).status_code != 200:
+            raise APIError(failed or response)
+        pace = chunk_size / float(self.bandwidth) if self.bandwidth else 0
+        content = response.content
+        return self._latency(response), [(pace, content[start:start + chunk_size])
+                                         for start in range(0, len(content), chunk_size)]
+
+    def get(self, url, params=None, headers=None):
+        response, delay = self._reply(url, params)
+        if delay:
+            time.sleep(delay)
+        return response
+
+    def stream(self, url, params=None, headers=None, chunk_size=STREAM_CHUNK_SIZE):
+        latency, chunks = self._chunks(url, params, chunk_size)
+        if latency:
+            time.sleep(latency)
+        for pace, chunk in chunks:
+            if pace:
+                time.sleep(pace)
+            yield chunk
+
+    def close(self):
+        pass
+
+
+class AsyncReplayTransport(ReplayTransport):
+    """
+    ReplayTransport for AsyncAPI: injected delays don't block the event loop
+    """
+    async def get(self, url, params=None, headers=None):
+        response, delay = self._reply(url, params)
+        if delay:
+            await asyncio.sleep(delay)
+        return response
+
+    async def stream(self, url, params=None, headers=None, chunk_size=STREAM_CHUNK_SIZE):
+        latency, chunks = self._chunks(url, params, chunk_size)
+        if latency:
+            await asyncio.sleep(latency)
+        for pace, chunk in chunks:
+            if pace:
+                await asyncio.sleep(pace)
+            yield chunk
+
+    async def close(self):
+        pass
+
+
+class MemoryCache(object):
+    """
+    In-memory LRU response cache with per-entry TTL.
+
+    Optional arguments:
+        maxsize = 1024 (entries kept before the least recently used is evicted)
+    """
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.time():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, response, ttl):
+        with self._lock:
+            self._entries[key] = (time.time() + ttl, response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+
+class SQLiteCache(object):
+    """
+    On-disk LRU response cache with per-entry TTL, shareable between processes.
+
+    Required arguments:
+        path (sqlite database file)
+
+    Optional arguments:
+        maxsize = 10000 (entries kept before the least recently used are evicted)
+    """
+    def __init__(self, path, maxsize=10000):
+        self.path = path
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("""CREATE TABLE IF NOT EXISTS responses (
+            key TEXT PRIMARY KEY, expires REAL, used REAL,
+            url TEXT, status INTEGER, headers TEXT, content BLOB)""")
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_used ON responses (used)")
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT expires, url, status, headers, content FROM responses WHERE key = ?",
+                (key,)).fetchone()
+            if row is None or row[0] < now:
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE responses SET used = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        return StoredResponse(row[1], row[2], json.loads(row[3]), row[4])
+
+    def set(self, key, response, ttl):
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, now + ttl, now, response.url, response.status_code,
+                 json.dumps(dict(response.headers)), response.content))
+            self._db.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses "
+                "ORDER BY used DESC LIMIT -1 OFFSET ?)", (self.maxsize,))
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+
+    def stats(self):
+        size = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "size": size}
+
+
+class ValidatorStore(object):
+    """
+    Remembers ETag / Last-Modified validators and bodies per request, so
+    later calls are sent as conditional requests and a 304 is answered
+    from the stored body.
+
+    Optional arguments:
+        maxsize = 10000 (requests remembered before the least recently used is dropped)
+    """
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self.revalidations = 0
+        self.not_modified = 0
+        self.bytes_saved = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        returns (etag, last_modified, stored response) for a request key, or None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def headers(self, entry):
+        """
+        conditional request headers for a stored entry
+        """
+        etag, last_modified, _ = entry
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        self.revalidations += 1
+        return headers
+
+    def update(self, key, response):
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if response.status_code != 200 or not (etag or last_modified):
+            return
+        with self._lock:
+            self._entries[key] = (etag, last_modified, StoredResponse.from_response(response))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def unchanged(self, entry):
+        """
+        serves a 304 from the stored entry
+        """
+        stored = entry[2]
+        with self._lock:
+            self.not_modified += 1
+            self.bytes_saved += len(stored.content)
+        return stored
+
+    def stats(self):
+        return {"revalidations": self.revalidations, "not_modified": self.not_modified,
+                "bytes_saved": self.bytes_saved, "size": len(self._entries)}
+
+
+class SetIndex(object):
+    """
+    In-memory index of the member ids of listed collections (the likers of a
+    photo, the photos of an album, ...) used by the bulk membership checks
+    such as likes_many. Each set is kept for ttl seconds.
+
+    Optional arguments:
+        ttl = 300 (seconds)
+        maxsize = 256 (sets kept before the least recently used is evicted)
+    """
+    def __init__(self, ttl=300, maxsize=256):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._sets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._sets.get(key)
+            if entry is None or entry[0] < time.time():
+                if entry is not None:
+                    del self._sets[key]
+                self.misses += 1
+                return None
+            self._sets.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, members):
+        with self._lock:
+            self._sets[key] = (time.time() + self.ttl, frozenset(members))
+            self._sets.move_to_end(key)
+            while len(self._sets) > self.maxsize:
+                self._sets.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._sets.clear()
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._sets)}
+
+
+def _digest(value):
+    """
+    sha256 hex digest of a string, to key state by a secret without storing it
+    """
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()
+
+
+def _take(state, rate, capacity, now):
+    """
+    takes one token from a bucket state (tokens, updated), returns (new state, seconds to wait).
+    Tokens may go negative: the caller then waits until the debt is refilled.
+    """
+    tokens, updated = state or (capacity, now)
+    tokens = min(capacity, tokens + (now - updated) * rate) - 1
+    return (tokens, now), (-tokens / rate if tokens < 0 else 0.0)
+
+
+def _throttle(state, rate, capacity, now, remaining, reset_in):
+    """
+    lowers a bucket state to what the server reported as remaining
+    """
+    tokens, updated = state or (capacity, now)
+    tokens = min(capacity, tokens + (now - updated) * rate, remaining)
+    if remaining <= 0 and reset_in:
+        tokens = min(tokens, -reset_in * rate)
+    return (tokens, now), None
+
+
+def _rate_headers(headers):
+    """
+    returns (remaining, seconds until reset) from rate limit headers, or None
+    """
+    retry_after = headers.get('Retry-After')
+    remaining = headers.get('X-RateLimit-Remaining')
+    if retry_after is not None:
+        try:
+            return 0, float(retry_after)
+        except ValueError:
+            return None
+    if remaining is None:
+        return None
+    try:
+        remaining, reset = int(remaining), float(headers.get('X-RateLimit-Reset') or 0)
+    except ValueError:
+        return None
+    if reset > 1e9: # epoch seconds rather than a delay
+        reset = max(0.0, reset - time.time())
+    return remaining, reset
+
+
+class MemoryBuckets(object):
+    """
+    token bucket states of one process
+    """
+    def __init__(self):
+        self._states = {}
+        self._lock = threading.Lock()
+
+    def update(self, key, change, *args):
+        """
+        applies change(state, *args) -> (new state, result) atomically, returns result
+        """
+        with self._lock:
+            self._states[key], result = change(self._states.get(key), *args)
+            return result
+
+
+class FileBuckets(object):
+    """
+    token bucket states kept in a local SQLite file, shared by every process
+    using the same path. Each bucket is its own row, so an update touches
+    one record however many tokens there are. The file is created readable
+    by its owner only.
+
+    Required arguments:
+        path
+    """
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        os.close(os.open(path, os.O_RDWR | os.O_CREAT, 0o600))
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        # bucket states are cheap to lose, don't wait for the disk on every request
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=OFF")
+        self._db.execute("CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, "
+                         "tokens REAL, updated REAL)")
+
+    def update(self, key, change, *args):
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                state = self._db.execute("SELECT tokens, updated FROM buckets WHERE key = ?",
+                                         (key,)).fetchone()
+                state, result = change(state, *args)
+                self._db.execute("INSERT OR REPLACE INTO buckets VALUES (?, ?, ?)",
+                                 (key, state[0], state[1]))
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+            return result
+
+
+class RateLimiter(object):
+    """
+    Client-side token bucket limiter in front of make_request,
+    with one bucket per client_id and one per access_token.
+    Rate limit headers sent by the server (X-RateLimit-Remaining,
+    X-RateLimit-Reset, Retry-After) drain the buckets accordingly.
+
+    Optional arguments:
+        client_rate = 10.0 (requests per second per client_id)
+        client_burst = 20
+        token_rate = 2.0 (requests per second per access_token)
+        token_burst = 10
+        buckets = MemoryBuckets() (FileBuckets(path) to share the limits between processes)
+    """
+    def __init__(self, client_rate=10.0, client_burst=20, token_rate=2.0, token_burst=10,
+                 buckets=None):
+        self.client_rate = client_rate
+        self.client_burst = client_burst
+        self.token_rate = token_rate
+        self.token_burst = token_burst
+        self.buckets = buckets or MemoryBuckets()
+        self.waited = 0.0
+
+    def _limits(self, client_id, access_token):
+        limits = [("client:%s" % client_id, self.client_rate, self.client_burst)]
+        if access_token:
+            # buckets are keyed by a digest, the token itself is never stored
+            limits.append(("token:%s" % _digest(access_token), self.token_rate, self.token_burst))
+        return limits
+
+    def reserve(self, client_id, access_token=None):
+        """
+        takes a token from every bucket involved, returns the seconds to wait before sending
+        """
+        wait = 0.0
+        for key, rate, burst in self._limits(client_id, access_token):
+            wait = max(wait, self.buckets.update(key, _take, rate, burst, time.time()))
+        self.waited += wait
+        return wait
+
+    def acquire(self, client_id, access_token=None):
+        """
+        blocks until a request may be sent
+        """
+        wait = self.reserve(client_id, access_token)
+        if wait:
+            time.sleep(wait)
+
+    async def acquire_async(self, client_id, access_token=None):
+        """
+        waits on the event loop until a request may be sent
+        """
+        wait = self.reserve(client_id, access_token)
+        if wait:
+            await asyncio.sleep(wait)
+
+    def update(self, client_id, access_token, headers):
+        """
+        applies the rate limit headers of a response
+        """
+        reported = _rate_headers(headers)
+        if reported is None:
+            return
+        key, rate, burst = self._limits(client_id, access_token)[-1]
+        self.buckets.update(key, _throttle, rate, burst, time.time(), reported[0], reported[1])
+
+
+def _retry_after(headers):
+    """
+    seconds to wait from a Retry-After header (delay or HTTP date), or None
+    """
+    value = headers.get('Retry-After')
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        from email.utils import parsedate_to_datetime
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+class RetryPolicy(object):
+    """
+    Retries transient failures (transport errors, 429 and 5xx responses)
+    with exponential backoff and full jitter.
+
+    Optional arguments:
+        max_attempts = 3 (attempts per call, including the first)
+        backoff = 0.5 (seconds, doubled per attempt, a random delay up to it is used)
+        max_backoff = 30.0 (seconds)
+        deadline = None (seconds a call may take including retries)
+        statuses = (429, 500, 502, 503, 504)
+        respect_retry_after = True
+
+    Calls that are not idempotent (exchanging an oauth code) are only
+    retried on 429, which the server rejected without processing.
+    """
+    def __init__(self, max_attempts=3, backoff=0.5, max_backoff=30.0, deadline=None,
+                 statuses=(429, 500, 502, 503, 504), respect_retry_after=True):
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.deadline = deadline
+        self.statuses = statuses
+        self.respect_retry_after = respect_retry_after
+        self.retries = 0
+        self.retried_calls = 0
+        self.gave_up = 0
+        self._lock = threading.Lock()
+
+    def delay(self, attempt, elapsed, response=None, idempotent=True):
+        """
+        seconds to wait before retrying a failed attempt (0-based), None to give up.
+        response is None when the attempt raised a transport error.
+        """
+        status = response.status_code if response is not None else None
+        if status is not None and status not in self.statuses:
+            return None
+        if not idempotent and status != 429:
+            return None
+        delay = None
+        if self.respect_retry_after and response is not None:
+            delay = _retry_after(response.headers)
+        if delay is None:
+            delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        with self._lock:
+            if attempt + 1 >= self.max_attempts or (
+                    self.deadline is not None and elapsed + delay > self.deadline):
+                self.gave_up += 1
+                return None
+            self.retries += 1
+            if attempt == 0:
+                self.retried_calls += 1
+        return delay
+
+    def stats(self):
+        return {"retries": self.retries, "retried_calls": self.retried_calls, "gave_up": self.gave_up}
+
+
+class _Flight(object):
+    __slots__ = ('future', 'waiters')
+
+    def __init__(self, future):
+        self.future = future
+        self.waiters = 0
+
+
+class SingleFlight(object):
+    """
+    Coalesces identical in-flight requests (same path, payload and token):
+    the first caller makes the network call, concurrent callers wait for it
+    and all of them get the same SharedResponse.
+    """
+    def __init__(self):
+        self.calls = 0
+        self.coalesced = 0
+        self._flights = {}
+        self._async_flights = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fetch):
+        """
+        returns fetch(), or the result of an identical call already in flight
+        """
+        with self._lock:
+            self.calls += 1
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight(Future())
+            else:
+                flight.waiters += 1
+                self.coalesced += 1
+        if not leader:
+            return flight.future.result()
+        try:
+            result = fetch()
+        except BaseException as e:
+            self._land(self._flights, key)
+            flight.future.set_exception(e)
+            raise
+        if self._land(self._flights, key):
+            result = SharedResponse.from_response(result)
+        flight.future.set_result(result)
+        return result
+
+    async def do_async(self, key, fetch):
+        """
+        awaits fetch(), or the result of an identical call already in flight
+        """
+        self.calls += 1
+        flight = self._async_flights.get(key)
+        if flight is not None:
+            flight.waiters += 1
+            self.coalesced += 1
+            return await asyncio.shield(flight.future)
+        flight = self._async_flights[key] = _Flight(asyncio.get_event_loop().create_future())
+        try:
+            result = await fetch()
+        except BaseException as e:
+            self._async_flights.pop(key, None)
+            flight.future.set_exception(e)
+            flight.future.exception() # retrieved, no "never retrieved" warning without waiters
+            raise
+        if self._async_flights.pop(key).waiters:
+            result = SharedResponse.from_response(result)
+        flight.future.set_result(result)
+        return result
+
+    def _land(self, flights, key):
+        """
+        removes a finished flight, returns whether other callers joined it
+        """
+        with self._lock:
+            return flights.pop(key).waiters
+
+    def stats(self):
+        return {"calls": self.calls, "coalesced": self.coalesced}
+
+# latency histogram bucket bounds in seconds: 1ms to ~65s, four per doubling
+LATENCY_BUCKETS = tuple(0.001 * 2 ** (i / 4.0) for i in range(65))
+
+
+class Metrics(object):
+    """
+    Per-endpoint request metrics: calls, status codes, errors, bytes
+    received and a latency histogram, from which p50/p95/p99 are estimated.
+    Every attempt on the wire is counted, retries included; responses from
+    the cache or the mirror are not.
+
+        api = eyeem.API(..., metrics=eyeem.Metrics())
+        api.metrics.stats()       # {"photos/%d": {"calls": ..., "p95": ...}, ...}
+        api.metrics.prometheus()  # text exposition format
+    """
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._endpoints = {}
+        self._lock = threading.Lock()
+
+    def _entry(self, endpoint):
+        entry = self._endpoints.get(endpoint)
+        if entry is None:
+            entry = self._endpoints[endpoint] = {
+                "calls": 0, "errors": 0, "bytes": 0, "seconds": 0.0, "statuses": {},
+                "histogram": [0] * (len(self.buckets) + 1),
+            }
+        return entry
+
+    def observe(self, endpoint, status, size, seconds):
+        index = bisect_left(self.buckets, seconds)
+        with self._lock:
+            entry = self._entry(endpoint)
+            entry["calls"] += 1
+            entry["bytes"] += size
+            entry["seconds"] += seconds
+            entry["statuses"][status] = entry["statuses"].get(status, 0) + 1
+            entry["histogram"][index] += 1
+
+    def error(self, endpoint, seconds):
+        index = bisect_left(self.buckets, seconds)
+        with self._lock:
+            entry = self._entry(endpoint)
+            entry["calls"] += 1
+            entry["errors"] += 1
+            entry["seconds"] += seconds
+            entry["histogram"][index] += 1
+
+    def quantile(self, histogram, q):
+        """
+        estimates the q-quantile of a histogram, interpolating within the bucket
+        """
+        rank = q * sum(histogram)
+        seen = 0
+        for index, hits in enumerate(histogram):
+            if hits and seen + hits >= rank:
+                if index == len(self.buckets):
+                    return self.buckets[-1]
+                low = self.buckets[index - 1] if index else 0.0
+                return low + (self.buckets[index] - low) * (rank - seen) / hits
+            seen += hits
+        return 0.0
+
+    def stats(self):
+        with self._lock:
+            entries = dict((endpoint, dict(entry, statuses=dict(entry["statuses"]),
+                                           histogram=list(entry["histogram"])))
+                           for endpoint, entry in self._endpoints.items())
+        stats = {}
+        for endpoint, entry in entries.items():
+            histogram = entry.pop("histogram")
+            for name, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99)):
+                entry[name] = self.quantile(histogram, q)
+            stats[endpoint] = entry
+        return stats
+
+    def prometheus(self, prefix="eyeem"):
+        """
+        the metrics in the Prometheus text exposition format
+        """
+        with self._lock:
+            entries = sorted((endpoint, dict(entry, statuses=dict(entry["statuses"]),
+                                             histogram=list(entry["histogram"])))
+                             for endpoint, entry in self._endpoints.items())
+        labels = [(entry, 'endpoint="%s"' % endpoint) for endpoint, entry in entries]
+        # every family is one contiguous group: its TYPE line, then all endpoints
+        lines = ["# TYPE %s_requests_total counter" % prefix]
+        for entry, label in labels:
+            for status, calls in sorted(entry["statuses"].items()):
+                lines.append('%s_requests_total{%s,status="%s"} %d' % (prefix, label, status, calls))
+        lines.append("# TYPE %s_request_errors_total counter" % prefix)
+        for entry, label in labels:
+            lines.append("%s_request_errors_total{%s} %d" % (prefix, label, entry["errors"]))
+        lines.append("# TYPE %s_response_bytes_total counter" % prefix)
+        for entry, label in labels:
+            lines.append("%s_response_bytes_total{%s} %d" % (prefix, label, entry["bytes"]))
+        lines.append("# TYPE %s_request_duration_seconds histogram" % prefix)
+        for entry, label in labels:
+            cumulative = 0
+            for bound, hits in zip(self.buckets + (None,), entry["histogram"]):
+                cumulative += hits
+                lines.append('%s_request_duration_seconds_bucket{%s,le="%s"} %d' % (
+                    prefix, label, "+Inf" if bound is None else "%.6g" % bound, cumulative))
+            lines.append("%s_request_duration_seconds_sum{%s} %.6f" % (prefix, label, entry["seconds"]))
+            lines.append("%s_request_duration_seconds_count{%s} %d" % (prefix, label, entry["calls"]))
+        return "\n".join(lines) + "\n"
+
+
+class _Call(object):
+    """
+    state of one make_request call, threaded from _prepare to _complete
+    """
+    __slots__ = ('path', 'url', 'payload', 'key', 'ttl', 'cached', 'validated', 'headers',
+                 'idempotent')
+
+    def __init__(self, path, url, payload):
+        self.path = path
+        self.url = url
+        self.payload = payload
+        self.key = None
+        self.ttl = None
+        self.cached = None
+        self.validated = None
+        self.headers = None
+        self.idempotent = True
+
 
 class API(object):
-    def __init__(self, client_id, client_secret, callback_url, loglevel):
+    def __init__(self, client_id, client_secret, callback_url, loglevel, transport=None,
+                 max_workers=8, cache=None, cache_ttls=None, validators=None, single_flight=None,
+                 rate_limiter=None, retry=None,
+                 decoder=None, mirror=None, mirror_max_age=300, metrics=None, set_index=None,
+                 membership_max=2000, tokens=None):
         self.api_url = API_URL
         self.version_id = API_VERSION
         self.client_id = client_id
         self.client_secret = client_secret
         self.callback_url = callback_url
-        logging.basicConfig(level=log_levels[loglevel])
-        self.base_payload = {'client_id': self.client_id}
-        
+        self.loglevel = log_levels[loglevel]
+        self.base_payload = MappingProxyType({'client_id': self.client_id})
+        self.transport = transport or Transport()
+        self.max_workers = max_workers
+        self._executor = None
+        self.cache = cache
+        self.cache_ttls = dict(CACHE_TTLS, **(cache_ttls or {}))
+        self.validators = validators
+        self.single_flight = single_flight
+        self.rate_limiter = rate_limiter
+        self.retry = retry
+        self.decoder = decoder or _default_decoder()
+        self.mirror = mirror
+        self.mirror_max_age = mirror_max_age
+        self.metrics = metrics
+        self.set_index = set_index
+        self.membership_max = membership_max
+        self.tokens = tokens
+        self.hooks = {"before_request": [], "after_response": [], "on_error": []}
+
+    def close(self):
+        """
+        closes the pooled connections of the transport
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        if self.mirror is not None:
+            self.mirror.flush()
+        self.transport.close()
+
+    def _pool(self):
+        """
+        thread pool for background work (page prefetching), created on first use
+        """
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    def as_user(self, access_token, user_id=None):
+        """
+        A view of this client that sends access_token with every call.
+
+        The view shares the connection pool, thread pool, cache, rate limiter
+        and every other option with this client, so creating one is cheap
+        enough to do per web request. Cache entries, coalescing and rate
+        limit buckets are keyed by the token, so users never see each
+        other's responses or spend each other's quota.
+
+        Required arguments:
+            access_token
+
+        Optional arguments:
+            user_id = None
+        """
+        return self._view(self, access_token, user_id)
+
+    def for_user(self, user_id):
+        """
+        A view of this client (see as_user) with the access token stored for user_id
+        in the token store; KeyError when there is none.
+        """
+        token = self.tokens.get(user_id) if self.tokens is not None else None
+        if token is None:
+            raise KeyError("no access token stored for user %s" % user_id)
+        return self._view(self, token, user_id)
+
+    def authorize(self, code):
+        """
+        Exchanges the code received from callback for an access token, stores
+        the token for the user in the token store and returns a view of the
+        client for that user (see as_user).
+        """
+        token = self.decode(self.get_authorization(code))['access_token']
+        user = self._request_json("users/me", {'access_token': token})['user']
+        if self.tokens is not None:
+            self.tokens.set(user['id'], token)
+        return self._view(self, token, user['id'])
+
     def create_auth_link(self):
         auth_link = "http://www.eyeem.com/oauth/authorize?response_type=code&client_id=%s&redirect_uri=%s" %(self.client_id, self.callback_url)
         return auth_link
@@ -43,33 +1772,606 @@ class API(object):
         exchanges the code received from callback for an access token
         """
         path = "oauth/token"
-        payload = self.base_payload
-        payload['grant_type'] = "authorization_code"
-        payload['client_id'] = self.client_id
-        payload['client_secret'] = self.client_secret
-        payload['redirect_uri'] = self.callback_url
-        payload['code'] = code
-        return self.make_request(path, payload)
-
-    def make_request(self, path, data):
+        payload = {
+            'grant_type': "authorization_code",
+            'client_secret': self.client_secret,
+            'redirect_uri': self.callback_url,
+            'code': code,
+        }
+        return self.make_request(path, payload, idempotent=False)
+
+    def make_request(self, path, data, idempotent=True):
         """
         utility function to make requests agains a resource path with payload
         """
-        url = "%s/%s/%s" %(self.api_url, self.version_id, path)
-        payload = self.base_payload
-        for k,v in data.iteritems():
-            payload[k] = v
-        req = requests.get(url, params=payload)
-        logging.info("requesting %s" %(req.url))
+        call = self._prepare(path, self._url(path), self._params(data))
+        call.idempotent = idempotent
+        if call.cached is not None:
+            return call.cached
+        if self.single_flight is not None:
+            return self.single_flight.do(call.key, lambda: self._fetch(call))
+        return self._fetch(call)
+
+    def _fetch(self, call):
+        """
+        sends the request, retrying as the retry policy allows
+        """
+        attempt, start = 0, time.time()
+        while True:
+            try:
+                req = self._attempt(call)
+            except getattr(self.transport, 'errors', ()):
+                delay = self._retry_delay(call, attempt, start)
+                if delay is None:
+                    raise
+            else:
+                delay = self._retry_delay(call, attempt, start, req)
+                if delay is None:
+                    return self._complete(call, req)
+            attempt += 1
+            time.sleep(delay)
+
+    def _attempt(self, call):
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(self.client_id, call.payload.get('access_token'))
+        start = time.perf_counter()
+        try:
+            req = self.transport.get(call.url, params=call.payload, headers=call.headers)
+        except Exception as error:
+            self._failed(call, error, start)
+            raise
+        self._after(call, req, start)
+        if self.rate_limiter is not None:
+            self.rate_limiter.update(self.client_id, call.payload.get('access_token'), req.headers)
         return req
 
+    def add_hook(self, event, callback):
+        """
+        Registers a callback for every request sent on the wire.
+
+        Required arguments:
+            event ("before_request": callback(path, params), once per call before the
+                                     mirror and cache are consulted, params may be changed;
+                   "after_response": callback(path, response, seconds);
+                   "on_error": callback(path, error, seconds))
+            callback
+        """
+        self.hooks[event].append(callback)
+
+    def _before(self, path, payload):
+        for callback in self.hooks["before_request"]:
+            callback(path, payload)
+
+    def _after(self, call, response, start, size=None):
+        seconds = time.perf_counter() - start
+        logger.debug("requesting %s", response.url)
+        if self.metrics is not None:
+            self.metrics.observe(_endpoint(call.path), response.status_code,
+                                 len(response.content) if size is None else size, seconds)
+        for callback in self.hooks["after_response"]:
+            callback(call.path, response, seconds)
+
+    def _failed(self, call, error, start):
+        seconds = time.perf_counter() - start
+        if self.metrics is not None:
+            self.metrics.error(_endpoint(call.path), seconds)
+        for callback in self.hooks["on_error"]:
+            callback(call.path, error, seconds)
+
+    def _retry_delay(self, call, attempt, start, response=None):
+        if self.retry is None:
+            return None
+        return self.retry.delay(attempt, time.time() - start, response, call.idempotent)
+
+    def _url(self, path):
+        return "%s/%s/%s" %(self.api_url, self.version_id, path.lstrip("/"))
+
+    def _params(self, data):
+        """
+        the parameters of one call: a new dict, never shared with other calls
+        """
+        params = dict(self.base_payload)
+        params.update(data)
+        return params
+
+    def _prepare(self, path, url, payload):
+        """
+        runs the before_request hooks, then looks the request up in the mirror,
+        the cache and the validator store
+        """
+        self._before(path, payload)
+        call = _Call(path, url, payload)
+        if self.mirror is not None:
+            call.cached = self._mirrored(path, url, payload)
+            if call.cached is not None:
+                return call
+        if self.cache is None and self.validators is None and self.single_flight is None:
+            return call
+        call.key = _request_key(path, payload)
+        if self.cache is not None:
+            call.ttl = self.cache_ttls.get(_endpoint(path))
+            if call.ttl:
+                call.cached = self.cache.get(call.key)
+        if call.cached is None and self.validators is not None:
+            call.validated = self.validators.get(call.key)
+            if call.validated is not None:
+                call.headers = self.validators.headers(call.validated)
+        return call
+
+    def _complete(self, call, response):
+        """
+        resolves a 304 from the validator store and fills the cache
+        """
+        if self.validators is not None:
+            if response.status_code == 304 and call.validated is not None:
+                response = self.validators.unchanged(call.validated)
+            else:
+                self.validators.update(call.key, response)
+        if call.ttl and response.status_code == 200:
+            self.cache.set(call.key, StoredResponse.from_response(response), call.ttl)
+        if self.mirror is not None and response.status_code == 200:
+            try:
+                body = self.decode(response)
+            except ValueError:
+                body = None # not JSON, e.g. the empty body of an existence check
+            if isinstance(body, dict):
+                self.mirror.record(call.path, body, call.payload)
+        return response
+
+    def _mirrored(self, path, url, payload):
+        """
+        answers get_photo_by_id, get_album_by_id and user_by_id from the mirror
+        when the record is fresh and the call asks for no particular options
+        and sends no access token: only records fetched the same way qualify
+        """
+        kind = MIRRORED_ENDPOINTS.get(_endpoint(path))
+        if kind is None or set(payload) - set(('client_id',)):
+            return None
+        record = self.mirror.get(kind, int(path.rstrip("/").rsplit("/", 1)[1]), self.mirror_max_age,
+                                 complete=True)
+        if record is None:
+            return None
+        return StoredResponse(url, 200, {}, json.dumps({kind: record}).encode("utf-8"))
+
+    def decode(self, response, paths=None):
+        """
+        Decodes a response body with the configured decoder.
+
+        Optional arguments:
+            paths = None (dotted keys such as ["photos.items", "photos.total"]:
+                          only those are decoded, the rest of the body is skipped)
+        """
+        if paths is not None:
+            return decode_partial(response.content, paths)
+        if isinstance(response, SharedResponse):
+            return response.json()
+        return self.decoder(response.content)
+
+    def _request_json(self, path, data):
+        """
+        makes the request and returns the decoded JSON body
+        """
+        return self.decode(self.make_request(path, data))
+
+    def _request_exists(self, path, data):
+        """
+        makes the request and returns True for 200, False otherwise
+        """
+        return self.make_request(path, data).status_code == 200
+
+
+    def albums_onboarding(self):
+        """
+        not implemented
+        """
+        raise NotImplementedError("This method is not implemented.")
+
+    def venue_fs_token(self):
+        raise NotImplementedError("This method is available to EyeEm native clients only.")
+
 
     ##########
-    # PHOTOS #
+    # PAGING #
     ##########
 
-    def get_photos(self, **kwargs):
+    def _iterate(self, method, args, kwargs):
+        kwargs = dict(kwargs)
+        limit = kwargs.pop('limit', PAGE_LIMIT)
+        offset = kwargs.pop('offset', 0)
+
+        def fetch(offset):
+            return self._paged(method(*args, limit=limit, offset=offset, **kwargs))
+
+        pending = self._pool().submit(fetch, offset)
+        try:
+            while True:
+                items, page_limit, total = pending.result()
+                offset += len(items)
+                last = _last_page(items, page_limit, limit, offset, total)
+                if not last:
+                    pending = self._pool().submit(fetch, offset)
+                for item in items:
+                    yield item
+                if last:
+                    return
+        finally:
+            pending.cancel()
+
+    def _paged(self, response):
+        """
+        (items, limit, total) of a page, APIError if it failed
+        """
+        if response.status_code != 200:
+            raise APIError(response)
+        return _page(self.decode(response))
+
+
+    #############
+    # STREAMING #
+    #############
+
+    def stream_items(self, path, data, key="items"):
+        """
+        Requests a paged resource and yields the items of its array as they
+        arrive, without buffering the whole body. Streamed calls skip the
+        cache, coalescing and retries but wait for the rate limiter and run
+        the hooks; once the array has been read, after_response gets a
+        response without body. A status other than 200 raises APIError.
+
+        Required arguments:
+            path (e.g. "albums/123/photos")
+            data (dict of parameters)
+        """
+        call = _Call(path, self._url(path), self._params(data))
+        self._before(path, call.payload)
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(self.client_id, call.payload.get('access_token'))
+        parser = ItemParser(key)
+        start = time.perf_counter()
+        size = 0
+        try:
+            for chunk in self.transport.stream(call.url, params=call.payload):
+                size += len(chunk)
+                for item in parser.feed(chunk):
+                    yield item
+                if parser.done:
+                    break
+            parser.close()
+        except Exception as error:
+            self._failed(call, error, start)
+            raise
+        self._after(call, StoredResponse(call.url, 200, {}, b""), start, size)
+
+
+    ############
+    # BATCHING #
+    ############
+
+    def fetch_photos(self, ids, **kwargs):
+        """
+        Retrieves any number of photos by id through get_photos(ids=...).
+        Ids are deduped and split into URL-length-safe batches that are fetched concurrently,
+        photos missing from a batch are retried with get_photo_by_id.
+        A batch or single request that fails (other than a 404) raises APIError.
+
+        Required arguments:
+            ids (iterable of photo ids)
+
+        Optional arguments:
+            the ones of get_photos, e.g. detailed=1
+
+        Returns: a list of photo dicts in the order of ids, None for photos that don't exist
+        """
+        return self._fetch_many(ids, "photos", self.get_photos, self.get_photo_by_id, "photo", kwargs)
+
+    def fetch_albums(self, ids, **kwargs):
+        """
+        Retrieves any number of albums by id through get_albums(ids=...).
+        Ids are deduped and split into URL-length-safe batches that are fetched concurrently,
+        albums missing from a batch are retried with get_album_by_id.
+        A batch or single request that fails (other than a 404) raises APIError.
+
+        Required arguments:
+            ids (iterable of album ids)
+
+        Optional arguments:
+            the ones of get_albums, e.g. includePhotos=0
+
+        Returns: a list of album dicts in the order of ids, None for albums that don't exist
+        """
+        return self._fetch_many(ids, "albums", self.get_albums, self.get_album_by_id, "album", kwargs)
+
+    def _fetch_many(self, ids, path, batch_method, single_method, single_key, kwargs):
+        ids = list(ids)
+        unique = _dedupe(ids)
+        found, missing = _found(unique, self._pool().map(
+            lambda batch: self._fetch_batch(batch_method, batch, kwargs),
+            self._batches(path, unique, kwargs)))
+        singles = self._pool().map(
+            lambda i: self._fetch_single(single_method, single_key, i, kwargs), missing)
+        return _in_order(ids, found, missing, singles)
+
+    def _batches(self, path, ids, kwargs):
+        """
+        splits ids into batches whose request URL stays below MAX_URL_LENGTH
+        """
+        params = dict(self.base_payload, **kwargs)
+        budget = MAX_URL_LENGTH - len(self._url(path)) - len(urlencode(params)) - len("?&ids=&limit=000")
+        batch, size = [], 0
+        for i in ids:
+            cost = len(str(i)) + 3 # a comma is sent as %2C
+            if batch and (size + cost > budget or len(batch) >= BATCH_SIZE):
+                yield batch
+                batch, size = [], 0
+            batch.append(i)
+            size += cost
+        if batch:
+            yield batch
+
+    def _fetch_batch(self, batch_method, batch, kwargs):
+        return self._batch_items(
+            batch_method(ids=",".join(str(i) for i in batch), limit=len(batch), **kwargs))
+
+    def _fetch_single(self, single_method, single_key, i, kwargs):
+        return self._single_item(single_method(i, **kwargs), single_key)
+
+    def _batch_items(self, response):
+        """
+        {id: item} of a batch response, APIError if it failed:
+        only ids missing from a good batch are worth asking for one by one
+        """
+        if response.status_code != 200:
+            raise APIError(response)
+        return dict((str(item['id']), item) for item in _page(self.decode(response))[0])
+
+    def _single_item(self, response, single_key):
+        """
+        the item of a single response, None for a 404 and APIError for other failures
+        """
+        if response.status_code == 404:
+            return None
+        if response.status_code != 200:
+            raise APIError(response)
+        return self.decode(response).get(single_key)
+
+
+    ##############
+    # MEMBERSHIP #
+    ##############
+
+    def likes_many(self, photo_id, user_ids, **kwargs):
+        """
+        Checks for many users whether they like a photo: the likers are listed
+        once instead of a get_user_likes_photo call per user.
+
+        Required arguments:
+            photo_id
+            user_ids (iterable of user ids)
+
+        Optional arguments:
+            access_token = None
+
+        Returns: a list of booleans in the order of user_ids
+        """
+        return self._members_many("photos/%d/likers" %(int(photo_id)), user_ids, kwargs)
+
+    def photos_in_album_many(self, album_id, photo_ids, **kwargs):
+        """
+        Checks for many photos whether they are in an album: the photo ids of
+        the album are listed once (onlyId=1) instead of a photo_in_album call per photo.
+
+        Required arguments:
+            album_id
+            photo_ids (iterable of photo ids)
+
+        Returns: a list of booleans in the order of photo_ids
+        """
+        return self._members_many("albums/%d/photos" %(int(album_id)), photo_ids, kwargs)
+
+    def favorited_many(self, album_id, user_ids, **kwargs):
+        """
+        Checks for many users whether they favorited an album: the favoriters
+        are listed once instead of a user_favorited_album call per user.
+
+        Required arguments:
+            album_id
+            user_ids (iterable of user ids)
+
+        Returns: a list of booleans in the order of user_ids
+        """
+        return self._members_many("albums/%d/favoriters" %(int(album_id)), user_ids, kwargs)
+
+    def friends_many(self, user_id, friend_ids, **kwargs):
+        """
+        Checks for many users whether the given user follows them: the friends
+        are listed once instead of a users_are_friends call per user.
+
+        Required arguments:
+            user_id
+            friend_ids (iterable of user ids)
+
+        Returns: a list of booleans in the order of friend_ids
+        """
+        return self._members_many("users/%d/friends" %(int(user_id)), friend_ids, kwargs)
+
+    def blocked_many(self, user_id, blocked_user_ids, **kwargs):
+        """
+        Checks for many users whether the given user blocked them. There is no
+        list of blocked users, so every pair is checked, concurrently.
+
+        Required arguments:
+            user_id
+            blocked_user_ids (iterable of user ids)
+
+        Optional arguments:
+            access_token = None
+
+        Returns: a list of booleans in the order of blocked_user_ids
+        """
+        return self._members_many("users/%d/blocked" %(int(user_id)), blocked_user_ids, kwargs,
+                                  listed=False)
+
+    def _members_many(self, path, ids, kwargs, listed=True):
+        """
+        answers from the member set of path, or with one path/<id> call per id
+        when the collection can't be listed or is larger than membership_max
+        """
+        ids = list(ids)
+        unique = _dedupe(ids)
+        members = self._member_set(path, kwargs) if listed and unique else None
+        if members is None:
+            members = _existing(unique, self._pool().map(
+                lambda i: self._request_exists("%s/%d" %(path, int(i)), kwargs), unique))
+        return [str(i) in members for i in ids]
+
+    def _member_set(self, path, kwargs):
+        key, members = self._indexed_members(path, kwargs)
+        if members is not None:
+            return members
+        first = self._member_page(path, 0, kwargs)
+        offsets = self._member_offsets(first)
+        if offsets is None:
+            return None
+        rest = list(self._pool().map(lambda offset: self._member_page(path, offset, kwargs), offsets))
+        return self._index_members(key, first, rest)
+
+    def _member_page(self, path, offset, kwargs):
+        return self._listing(self.make_request(path, _member_params(kwargs, offset)))
+
+    def _indexed_members(self, path, kwargs):
+        """
+        (set index key, member set kept in the set index or None)
+        """
+        key = _request_key(path, self._params(kwargs))
+        return key, self.set_index.get(key) if self.set_index is not None else None
+
+    def _member_offsets(self, first):
+        """
+        offsets of the pages after the first, None when the collection can't be
+        listed: the first page failed or the collection is larger than membership_max
+        """
+        if first is None:
+            return None
+        items, limit, total = first
+        if total is None or total > self.membership_max:
+            return None
+        return range(len(items), total, limit or MEMBERSHIP_LIMIT) if items else ()
+
+    def _index_members(self, key, first, rest):
+        """
+        the member set of the listed pages, kept in the set index. None when a
+        page failed: a partial set would answer (and be cached as) false negatives
+        """
+        if None in rest:
+            return None
+        members = _member_ids([first[0]] + [page[0] for page in rest])
+        if self.set_index is not None:
+            self.set_index.set(key, members)
+        return members
+
+    def _listing(self, response):
+        """
+        (items, limit, total) of one page of an id listing, None if it failed
+        """
+        if response.status_code != 200:
+            return None
+        return _page(self.decode(response))
+
+
+    #############
+    # HYDRATION #
+    #############
+
+    def hydrate_photo(self, photo_id, parts=None, timeout=10.0, timeouts=None):
+        """
+        Retrieves a photo together with related resources in one call,
+        the sub-requests run concurrently on the API's thread pool.
+
+        Required arguments:
+            photo_id
+
+        Optional arguments:
+            parts = all of "photo", "likers", "comments", "people", "albums"
+            timeout = 10.0 (seconds per part)
+            timeouts = None (dict of part -> seconds, overrides timeout)
+
+        Returns: a dict with one entry per part that succeeded and an "errors" dict
+        with the exception of every part that failed or timed out.
         """
+        return self._hydrate(PHOTO_PARTS, photo_id, parts, timeout, timeouts)
+
+    def hydrate_album(self, album_id, parts=None, timeout=10.0, timeouts=None):
+        """
+        Retrieves an album together with related resources in one call,
+        the sub-requests run concurrently on the API's thread pool.
+
+        Required arguments:
+            album_id
+
+        Optional arguments:
+            parts = all of "album", "contributors", "favoriters", "related"
+            timeout = 10.0 (seconds per part)
+            timeouts = None (dict of part -> seconds, overrides timeout)
+
+        Returns: a dict with one entry per part that succeeded and an "errors" dict.
+        """
+        return self._hydrate(ALBUM_PARTS, album_id, parts, timeout, timeouts)
+
+    def hydrate_user(self, user_id, parts=None, timeout=10.0, timeouts=None):
+        """
+        Retrieves a user together with related resources in one call,
+        the sub-requests run concurrently on the API's thread pool.
+
+        Required arguments:
+            user_id
+
+        Optional arguments:
+            parts = all of "user", "photos", "followers", "friends", "favorite_albums", "topics"
+            timeout = 10.0 (seconds per part)
+            timeouts = None (dict of part -> seconds, overrides timeout)
+
+        Returns: a dict with one entry per part that succeeded and an "errors" dict.
+        """
+        return self._hydrate(USER_PARTS, user_id, parts, timeout, timeouts)
+
+    def _hydrate(self, table, object_id, parts, timeout, timeouts):
+        parts = list(table) if parts is None else parts
+        timeouts = timeouts or {}
+        start = time.time()
+        pending = dict((part, self._pool().submit(self._hydrate_part, table[part], object_id))
+                       for part in parts)
+        result = {"errors": {}}
+        for part, future in pending.items():
+            remaining = start + timeouts.get(part, timeout) - time.time()
+            try:
+                result[part] = future.result(timeout=max(0, remaining))
+            except FutureTimeout:
+                future.cancel()
+                result["errors"][part] = TimeoutError("%s timed out" % part)
+            except Exception as e:
+                result["errors"][part] = e
+        return result
+
+    def _hydrate_part(self, method, object_id):
+        return self._part_body(getattr(self, method)(object_id))
+
+    def _part_body(self, response):
+        """
+        the unwrapped body of a part, endpoints returning decoded JSON are taken as is
+        """
+        if isinstance(response, dict):
+            return _unwrap(response)
+        if response.status_code != 200:
+            raise APIError(response)
+        return _unwrap(self.decode(response))
+
+
+ENDPOINTS = (
+    ##########
+    # PHOTOS #
+    ##########
+
+    Endpoint("get_photos", "photos", paging="offset", doc="""
         Retrieves the authenticated user's latest twenty photos or popular photos (collection).
         The params type,date,frame/filter,ids are processed in that order. The first match is the source of the response.
         
@@ -92,15 +2394,8 @@ class API(object):
             includeAlbums = 0
             userDetails = 0
             simpleDescription = 0
-        """
-        payload = self.base_payload
-        for k, v in kwargs.iteritems():
-            payload[k] = v
-        path = "photos"
-        return self.make_request(path, payload)
- 
-    def get_photo_by_id(self, photo_id, **kwargs):
-        """ 
+        """),
+    Endpoint("get_photo_by_id", "photos/{photo_id}", doc=""" 
         Retrieves a photo by id. 
 
         Required argument:
@@ -117,80 +2412,40 @@ class API(object):
             includePeople = 1
             numPeople = 10
             simpleDescription = 0
-        """
-        payload = self.base_payload
-        for k, v in kwargs.iteritems():
-            payload[k] = v
-        path = "photos/%d" %(photo_id)
-        return self.make_request(path, payload)
-
-    def get_popular_photos(self):
-        """
-        Return a collection of the current popular photos.
-        """
-        path = "photos/popular"
-        return self.make_request(path, self.base_payload).json()
-
-    def get_tagged_in_photo(self, photo_id):
-        """
+        """),
+    Endpoint("get_popular_photos", "photos/popular", returns="json", options=False, doc="""
+        Return a collection of the current popular photos.
+        """),
+    Endpoint("get_tagged_in_photo", "photos/{photo_id}/people", returns="json", options=False, doc="""
         Retrieves an array of people tagged in the photo
         Args: photo_id
-        """
-        path = "/photos/%d/people" %(photo_id)
-        return self.make_request(path, self.base_payload).json()
-
-    
-    def get_photo_likers(self, photo_id):
-        """
+        """),
+    Endpoint("get_photo_likers", "photos/{photo_id}/likers", returns="json", options=False, doc="""
         Retrieves an array of the users who like the photo.
         Args: photo_id
-        """
-        path = "/photos/%d/likers" %(photo_id)
-        return self.make_request(path, self.base_payload).json()
-
-    def get_user_likes_photo(self, user_id, photo_id):
-        """
+        """),
+    Endpoint("get_user_likes_photo", "photos/{photo_id}/likers/{user_id}", args=("user_id", "photo_id"), returns="exists", options=False, doc="""
         Checks whether a user likes a photo.
         Args: user_id, photo_id
-        """
-        path = "/photos/%d/likers/%d" %(photo_id, user_id)
-        status_code = make_request(path, self.base_payload).status_code
-        if status_code == 200:
-            return True
-        else:
-            return False
-
-    def get_photo_comments(self, photo_id):
-        """
+        """),
+    Endpoint("get_photo_comments", "photos/{photo_id}/comments", options=False, doc="""
         Retrieves an array of a photo's comments.
         Args: photo_id
-        """
-        path = "/photos/%d/comments" %(photo_id)
-        return self.make_request(path, self.base_payload)
-
-    def get_comment_by_id(self, photo_id, comment_id):
-        """
+        """),
+    Endpoint("get_comment_by_id", "photos/{photo_id}/comments/{comment_id}", options=False, doc="""
         Retrieves a specific comment on a photo.
         Args: photo_id, comment_id
-        """
-        path = "photos/%d/comments/%d" %(photo_id, comment_id)
-        return self.make(path, self.base_payload)
-
-    def get_photos_album(self, photo_id):
-        """
+        """),
+    Endpoint("get_photos_album", "photos/{photo_id}/albums", options=False, doc="""
         Retrieves an array of a photo's albums.
         Args: photo_id
-        """
-        path = "photos/%d/albums" %(photo_id)
-        return self.make(path, self.base_payload)
-
+        """),
 
     ############
     # DISCOVER #
     ############
 
-    def discover(self, **kwargs):
-        """
+    Endpoint("discover", "discover", paging="offset", doc="""
         Retrieves a dedicated discover feed - tailored to the user's preferences (or a generic one for non-authed endpoints)
         Optional arguments:
             limit = 30
@@ -203,15 +2458,8 @@ class API(object):
             city  = None
             cc= None
             filter= None
-        """
-        payload = self.base_payload
-        for k, v in kwargs.iteritems():
-            payload[k] = v
-        path = "discover"
-        return self.make_request(path, payload)
-
-    def discover_albums(self, **kwargs):
-        """
+        """),
+    Endpoint("discover_albums", "discover", doc="""
         Retrieves a dedicated discover feed (made up ONLY of albums)
         tailored to the user's preferences (or a generic one for non-authed endpoints)
         
@@ -226,19 +2474,13 @@ class API(object):
             includeLikers = 1
             filter = None 
             detailed = 0
-        """
-        path = "discover"
-        payload = self.base_payload
-        for k, v in kwargs.iteritems():
-            payload[k] = v
-        return self.make_request(path, payload)
-        
+        """),
+
     ##########
     # ALBUMS #
     ##########
 
-    def get_albums(self, **kwargs):
-        """
+    Endpoint("get_albums", "albums", paging="offset", doc="""
         Retrieves albums specified in the id URL query parameter, 
         or searches for albums based on their names.
 
@@ -261,15 +2503,8 @@ class API(object):
             venueCategory = 0
             trending = 0
             ids = None
-        """
-        path = "albums"
-        payload = self.base_payload
-        for k, v in kwargs.iteritems():
-            payload[k] = v
-        return self.make_request(path, payload)
-
-    def get_album_by_id(self, album_id, **kwargs):
-        """
+        """),
+    Endpoint("get_album_by_id", "albums/{album_id}", doc="""
         Retrieves album by its id
 
         Required arguments:
@@ -291,31 +2526,16 @@ class API(object):
             photoNumComments=1
             photoAlbums=1
             userDetails=0
-        """
-        path = "albums/%s" %(album_id)
-        payload = self.base_payload
-        for k, v in kwargs.iteritems():
-            payload[k] = v
-        return self.make_request(path, payload)
-
-    def user_favorited_album(self, album_id, user_id):
-        """
+        """),
+    Endpoint("user_favorited_album", "albums/{album_id}/favoriters/{user_id}", returns="exists", options=False, doc="""
         Checks whether a user favorited an album.
         returns 200 if the user favorited the album, 404 otherwise
 
         Required arguments:
             album_id
             user_id
-        """
-        path = "albums/%d/favoriters/%d" %(album_id, user_id)
-        status_code = make_request(path, self.base_payload).status_code
-        if status_code == 200:
-            return True
-        else:
-            return False
-
-    def album_contributors(self, album_id, **kwargs):
-        """
+        """),
+    Endpoint("album_contributors", "albums/{album_id}/contributors", paging="offset", doc="""
         Retrieves an array of the users who have added photos to the album.
 
         Required arguments:
@@ -326,15 +2546,8 @@ class API(object):
             offset=0 
             onlyId=0 
             detailed=0 
-        """
-        path = "/albums/%d/contributors" %(album_id)
-        payload = self.base_payload
-        for k, v in kwargs.iteritems():
-            payload[k] = v
-        return self.make_request(path, payload)
-
-    def album_photos(self, album_id):
-        """
+        """),
+    Endpoint("album_photos", "albums/{album_id}/photos", paging="offset", stream="photos", doc="""
         required argument:
             album_id
 
@@ -359,30 +2572,15 @@ class API(object):
             includeAlbums=0
             userDetails=0
             simpleDescription=0 
-        """
-        path = "albums/%d/photos" %(album_id)
-        payload = self.base_payload
-        for k, v in kwargs.iteritems():
-            payload[k] = v
-        return self.make_request(path, payload)
-
-    def photo_in_album(self, album_id, photo_id):
-        """
+        """),
+    Endpoint("photo_in_album", "albums/{album_id}/photos/{photo_id}", returns="exists", options=False, doc="""
         Checks whether a photo is in a particular album
 
         Required arguments:
             album_id
             photo_id
-        """
-        path = "albums/%d/photos/%d" %(album_id, photo_id)
-        status_code = make_request(path, self.base_payload).status_code
-        if status_code == 200:
-            return True
-        else:
-            return False
-
-    def related_albums(self, album_id, **kwargs):
-        """
+        """),
+    Endpoint("related_albums", "albums/{album_id}/relatedAlbums", paging="offset", doc="""
         Retrieves albums related to the one specified in the id URL query parameter. 
         Useful for finding popular topics at specific venues, cities in a country, etc...
         
@@ -394,17 +2592,8 @@ class API(object):
             venueCategory=0 
             limit=30
             offset=0 
-        """
-        path = "albums/%d/relatedAlbums" %(album_id)
-        payload = self.base_payload
-        for k, v in kwargs.iteritems():
-            payload[k] = v
-        return self.make_request(path, payload)
-    
-
-    
-    def album_weather(self, album_id, **kwargs):
-        """
+        """),
+    Endpoint("album_weather", "albums/{album_id}/weather", doc="""
         Retrieves the weather in a certain city.
         Works only for city/venue albums.
 
@@ -413,35 +2602,20 @@ class API(object):
 
         Optional arguments:
             date=TODAY (use format: YYYY-MM-DD)
-        """
-        path = "albums/%d/weather" %(album_id)
-        payload = self.base_payload
-        for k, v in kwargs.iteritems():
-            payload[k] = v
-        return self.make_request(path, payload)
-
-    def album_venue_categories(self, album_id):
-        """
+        """),
+    Endpoint("album_venue_categories", "albums/{album_id}/venueCategories", options=False, doc="""
         Retrieves the venueCategories of albums associated with a certain city/country/tag album.
         
         Required arguments:
             album_id
-        """
-        path = "albums/%d/venueCategories"
-        return self.make_request(path, self.base_payload)
-
-    def album_muted(self, album_id):
-        """
+        """),
+    Endpoint("album_muted", "albums/{album_id}/mute", options=False, doc="""
         Check if a user has muted an album
 
         Required arguments:
             album_id
-        """
-        path = "albums/%d/mute" (album_id)
-        return self.make_request(path, self.base_payload)
-
-    def album_favoriters(self, album_id, **kwargs):
-        """
+        """),
+    Endpoint("album_favoriters", "albums/{album_id}/favoriters", paging="offset", doc="""
         Retrieves an array of the users who favorited the album.
 
         Required arguments:
@@ -450,22 +2624,8 @@ class API(object):
         Optional arguments:
             limit=20
             offset=0 
-        """
-        path = "albums/%d/favoriters"
-        payload = self.base_payload
-        for k, v in kwargs.iteritems():
-            payload[k] = v
-        return self.make_request(path, payload)
-
-    def albums_onboarding(self):
-        """
-        not implemented
-        """
-        raise NotImplementedError("This method is not implemented.")
-
-
-    def collections(self):
-        """
+        """),
+    Endpoint("collections", "collections", doc="""
         Retrieves a collection of photos (at the moment, only "nearbyLive" is supported)
         NearbyLive is a mixture of photos uploaded very close to me w/in the last 2 hours + all nearby photos (geo-box)
         
@@ -484,17 +2644,13 @@ class API(object):
             includePeople=0
             numPeople=10
             simpleDescription=0
-        """
-        path = "collections"
-        return self.make_request(path, self.base_payload)
-
+        """),
 
     #########
     # USERS #
     #########
 
-    def users(self, **kwargs):
-        """
+    Endpoint("users", "users", paging="offset", doc="""
         Search for users or retrieve suggested users. either "suggested",or "q", or "ids".
 
         Optional arguments:
@@ -509,15 +2665,8 @@ class API(object):
             action_id=None 
 
         Response: 200, pagination params and a array of user objects (either those queried, or those suggested)
-        """
-        path = "users"
-        payload = self.base_payload
-        for k, v in kwargs.iteritems():
-            payload[k] = v
-        return self.make_request(path, payload)
-
-    def user_by_id(self, user_id, **kwargs):
-        """
+        """),
+    Endpoint("user_by_id", "users/{user_id}", doc="""
         Get a user's profile information. 
         Some parameters (liked settings, are only available to native clients.)
 
@@ -540,15 +2689,8 @@ class API(object):
 
         Response:
             200 and a user object
-        """
-        path = "/users/%d" %(user_id)
-        payload = self.base_payload
-        for k, v in kwargs.iteritems():
-            payload[k] = v
-        return self.make_request(path, payload)
-
-    def user_blocked_user(self, user_id, blocked_user_id):
-        """
+        """),
+    Endpoint("user_blocked_user", "users/{user_id}/blocked/{blocked_user_id}", returns="exists", options=False, doc="""
         check if the person (blocked_id) is blocked by the user (id)
         
         Required arguments:
@@ -557,16 +2699,8 @@ class API(object):
 
         Response:
             Status code 200 if user is indeed blocked
-        """
-        path = "/users/%d/blocked/%d" %(user_id, block_user_id)
-        status_code = make_request(path, self.base_payload).status_code
-        if status_code == 200:
-            return True
-        else:
-            return False
-
-    def user_contacts(self, user_id, **kwargs):
-        """
+        """),
+    Endpoint("user_contacts", "users/{user_id}/contacts", paging="offset", doc="""
         Finds eyeem and social media (facebook, twitter) friends.
         Requires authed user.
 
@@ -579,17 +2713,9 @@ class API(object):
             limit=20
             offset=0
             q=None
-        """
-        path = "users/%d/contacts" %(user_id)
-        payload = self.base_payload
-        for k, v in kwargs.iteritems():
-            payload[k] = v
-        return self.make_request(path, payload)
-
-
-    def user_sm_contacts(self, user_id, **kwargs):
-        # TODO: test or remove
-        """
+        """),
+    # TODO: test or remove
+    Endpoint("user_sm_contacts", "users/{user_id}/smContacts", doc="""
         Check social media accounts for friends (in eyeem, or to invite them)
         Requires authed user w/ native client.
 
@@ -600,16 +2726,8 @@ class API(object):
             matchContacts=0
             type=None
             detailed=1 
-        """
-        path = "users/%d/smContacts" %(user_id)
-        payload = self.base_payload
-        for k, v in kwargs.iteritems():
-            payload[k] = v
-        return self.make_request(path, payload)
-
-
-    def user_fb_page(self, user_id, **kwargs):
-        """
+        """),
+    Endpoint("user_fb_page", "users/{user_id}/facebookPages", doc="""
         Only available for the authenticated user,
         This call returns a service object with the Facebook pages of the user.
 
@@ -618,16 +2736,8 @@ class API(object):
 
         Optional arguments:
             page_id=None
-        """
-        path = "/users/%d/facebookPages" %(user_id)
-        payload = self.base_payload
-        for k, v in kwargs.iteritems():
-            payload[k] = v
-        return self.make_request(path, payload)
-
-
-    def user_favorite_albums(self, user_id, **kwargs):
-        """
+        """),
+    Endpoint("user_favorite_albums", "users/{user_id}/favoritedAlbums", paging="offset", doc="""
         Get all the albums that a user has favorited.
 
         Required arguments:
@@ -642,17 +2752,9 @@ class API(object):
             numPhotos=7 
             includeContributors=0 
             includeLikers=0 
-        """
-        path = "users/%d/favoritedAlbums" %(user_id)
-        payload = self.base_payload
-        for k, v in kwargs.iteritems():
-            payload[k] = v
-        return self.make_request(path, payload)
-
-
-    def user_feed(self, user_id, **kwargs):
-        # todo: try out! ;)
-        """
+        """),
+    # todo: try out! ;)
+    Endpoint("user_feed", "users/{user_id}/feed", paging="offset", doc="""
         Gets albums relevant to a user 
         Selection happens server side, includes albums they like, albums they contributed to, trending, recommended and nearby albums
         If requested from a user other than the authenticated one, only the user's liked albums are returned
@@ -670,28 +2772,15 @@ class API(object):
             numPhotos=10
             includeContributors=0
             includeLikers=0 
-        """
-        path = "users/%d/feed" %(user_id)
-        payload = self.base_payload
-        for k, v in kwargs.iteritems():
-            payload[k] = v
-        return self.make_request(path, payload)
-
-
-    def user_flags(self, user_id):
-        """
+        """),
+    Endpoint("user_flags", "users/{user_id}/flags", options=False, doc="""
         This call returns the user's chosen settings.
         Only available for the authenticated user.
 
         Required arguments:
             user_id
-        """
-        path = "users/%d/flags" %(user_id)
-        return self.make_request(path, self.base_payload)
-
-
-    def user_followers(self, user_id, **kwargs):
-        """
+        """),
+    Endpoint("user_followers", "users/{user_id}/followers", paging="offset", stream="users", doc="""
         Get a user's followers.
 
         Required arguments:
@@ -701,15 +2790,8 @@ class API(object):
             offset=0
             onlyId=None
             detailed=0 
-        """
-        path = "users/%d/followers" %(user_id)
-        payload = self.base_payload
-        for k, v in kwargs.iteritems():
-            payload[k] = v
-        return self.make_request(path, payload)
-
-    def user_friends(self, user_id, **kwargs):
-        """
+        """),
+    Endpoint("user_friends", "users/{user_id}/friends", paging="offset", doc="""
         Get a user's friends (users that they follow)
 
         Required arguments:
@@ -720,15 +2802,8 @@ class API(object):
             offset=0
             onlyId=None
             detailed=0 
-        """
-        path = "users/%d/friends" %(user_id)
-        payload = self.base_payload
-        for k, v in kwargs.iteritems():
-            payload[k] = v
-        return self.make_request(path, payload)
-
-    def user_friends_photos(self, user_id, **kwargs):
-        """
+        """),
+    Endpoint("user_friends_photos", "users/{user_id}/friendsPhotos", paging="offset", doc="""
         Get all the photos by users that the given user follows (ordered chronologically).
 
         Required arguments:
@@ -750,30 +2825,15 @@ class API(object):
             includeAlbums=0
             userDetails=0
             simpleDescription=0 
-        """
-        path = "users/%d/friendsPhotos" %(user_id)
-        payload = self.base_payload
-        for k, v in kwargs.iteritems():
-            payload[k] = v
-        return self.make_request(path, payload)
-
-    def users_are_friends(self, user_id, friend_id):
-        """
+        """),
+    Endpoint("users_are_friends", "users/{user_id}/friends/{friend_id}", returns="exists", options=False, doc="""
         Check if the given user is friends with (follows) another user.
 
         Required arguments:
             user_id
             friend_id
-        """
-        path = "users/%d/friends/%d" %(user_id, friend_id)
-        status_code = make_request(path, self.base_payload).status_code
-        if status_code == 200:
-            return True
-        else:
-            return False
-
-    def user_liked_photos(self, user_id, **kwargs):
-        """
+        """),
+    Endpoint("user_liked_photos", "users/{user_id}/likedPhotos", paging="offset", doc="""
         Get all the photos that a user has liked.
 
         Required arguments:
@@ -792,16 +2852,8 @@ class API(object):
             includeAlbums=0
             userDetails=0
             simpleDescription=0 
-        """
-        path = "users/%d/likedPhotos" %(user_id)
-        payload = self.base_payload
-        for k, v in kwargs.iteritems():
-            payload[k] = v
-        return self.make_request(path, payload)
-
-
-    def user_photos(self, user_id, **kwargs):
-        """
+        """),
+    Endpoint("user_photos", "users/{user_id}/photos", paging="offset", doc="""
         Get the given user's photos, sorted chronologically (default).
 
         Required arguments:
@@ -826,30 +2878,15 @@ class API(object):
             numPeople=4
             includeAlbums=0
             simpleDescription=0 
-        """
-        path ="users/%d/photos" %(user_id)
-        payload = self.base_payload
-        for k, v in kwargs.iteritems():
-            payload[k] = v
-        return self.make_request(path, payload)
-
-    def user_social_media(self, user_id):
-        """
+        """),
+    Endpoint("user_social_media", "users/{user_id}/socialMedia", options=False, doc="""
         Only available for the authenticated user.
         This call returns the status of the various connected social media accounts.
 
         Required arguments:
             user_id
-        """
-        path = "users/%d/socialMedia" %(user_id)
-        payload = self.base_payload
-        for k, v in kwargs.iteritems():
-            payload[k] = v
-        return self.make_request(path, payload)
-
-
-    def user_follow_suggestions(self, user_id, **kwargs):
-        """
+        """),
+    Endpoint("user_follow_suggestions", "users/{user_id}/suggestions", doc="""
         Get a list of suggested people to follow.
 
         Required arguments:
@@ -857,15 +2894,8 @@ class API(object):
         Optional arguments:
             service="all"
             detailed=0 
-        """
-        path = "users/%d/suggestions" %(user_id)
-        payload = self.base_payload
-        for k, v in kwargs.iteritems():
-            payload[k] = v
-        return self.make_request(path, payload)
-
-    def user_topics(self, user_id, **kwargs):
-        """
+        """),
+    Endpoint("user_topics", "users/{user_id}/topics", paging="offset", doc="""
         Get a list of topics the user has contributed to (the topics correlate to tag albums).
         
         Required arguments:
@@ -873,20 +2903,13 @@ class API(object):
         Optional arguments:
             limit=20 VM1635:8
             offset=0 
-        """
-        path = "users/%d/topics" %(user_id)
-        payload = self.base_payload
-        for k, v in kwargs.iteritems():
-            payload[k] = v
-        return self.make_request(path, payload)
-
+        """),
 
     ########
     # NEWS #
     ########
 
-    def news(self, **kwargs):
-        """
+    Endpoint("news", "news", doc="""
         Retrieves the authenticated user's news items (aggregated), either the latest items,
         or any items newer than newestId or any items older than oldestId.
 
@@ -894,30 +2917,19 @@ class API(object):
             limit=30
             oldestId=0
             newestId=0 
-        """
-        path = "news"
-        payload = self.base_payload
-        for k, v in kwargs.iteritems():
-            payload[k] = v
-        return self.make_request(path, payload)
-
-    def news_by_id(self, news_id):
-        """
+        """),
+    Endpoint("news_by_id", "news/{news_id}", options=False, doc="""
         Required arguments:
             news_id
 
         Returns: 200 + news object 403 if requesting user isn't authorized to view the item 404 if the item doesn't exist
-        """
-        path = "news/%d" %(news_id)
-        return self.make_request(path, self.base_payload)
-        
+        """),
 
     ##########
     # SEARCH #
     ##########
 
-    def search_photos(self, **kwargs):
-        """
+    Endpoint("search_photos", "search/photos", required=("q",), paging="offset", stream="photos", doc="""
         Retrieves an array containing photos
 
         Required arguments:
@@ -938,16 +2950,8 @@ class API(object):
             includePeople=1 
             numPeople=10 
             simpleDescription=0
-        """
-        path = "search/photos"
-        payload = self.base_payload
-        for k, v in kwargs.iteritems():
-            payload[k] = v
-        return self.make_request(path, payload)
-
-
-    def search_users_and_albums(self, **kwargs):
-        """
+        """),
+    Endpoint("search_users_and_albums", "search", required=("q",), doc="""
         Retrieves an array containing a users and an albums dictionary.
 
         Required arguments:
@@ -958,15 +2962,8 @@ class API(object):
             includeUsers=0
             limit=10
             offset=0 
-        """
-        path = "search"
-        payload = self.base_payload
-        for k, v in kwargs.iteritems():
-            payload[k] = v
-        return self.make_request(path, payload)
-
-    def search_albums(self, **kwargs):
-        """
+        """),
+    Endpoint("search_albums", "search/albums", required=("q",), paging="offset", doc="""
         Retrieves an array containing albums.
 
         Required arguments:
@@ -978,42 +2975,26 @@ class API(object):
             city_id=None
             album_type=None
             detailed=0 
-        """
-        path = "search/albums"
-        payload = self.base_payload
-        for k, v in kwargs.iteritems():
-            payload[k] = v
-        return self.make_request(path, payload)
+        """),
 
     ##########
     # TOPICS #
     ##########
 
-    def topics(self, **kwargs):
-        """
+    Endpoint("topics", "topics", required=("autoComplete",), doc="""
         Retrieves an array containing a users and an albums dictionary.
         Auto-complete, https://api.eyeem.com/v2/topics?autoComplete=be
         returns dict of items containing "BE"
 
         Required arguments:
             autoComplete (string to auto-complete)
-        """
-        path = "topics"
-        payload = self.base_payload
-        for k, v in kwargs.iteritems():
-            payload[k] = v
-        return self.make_request(path, payload)
-
+        """),
 
     ##########
     # VENUES #
     ##########
 
-    def venue_fs_token(self):
-        raise NotImplementedError("This method is available to EyeEm native clients only.")
-
-    def venue_search(self, **kwargs):
-        """
+    Endpoint("venue_search", "venues/search", required=("lat", "lng"), doc="""
         Retrieves venues for a specific location and topics for each venue. 
         Additionally, the current city album is returned. 
         If the X-hourOfDay header is provided, topic suggestions are filtered according to their relevance (ex: breakfast in the morning, dinner at night)
@@ -1029,9 +3010,1126 @@ class API(object):
 
         Example:
             https://api.eyeem.com/v2/venues/search?lat=52.2&lng=14.4
+        """),
+)
+
+_install(API, ENDPOINTS)
+
+
+class AsyncAPI(API):
+    """
+    asyncio counterpart of API.
+
+    Every endpoint method is shared with API and keeps its signature and
+    docstring, but returns an awaitable:
+
+        api = eyeem.AsyncAPI(client_id, client_secret, callback_url, "error")
+        photo = await api.get_photo_by_id(1234)
+        await api.close()
+    """
+    def __init__(self, client_id, client_secret, callback_url, loglevel, transport=None,
+                 **options):
+        API.__init__(self, client_id, client_secret, callback_url, loglevel,
+                     transport=transport or AsyncTransport(), **options)
+
+    async def close(self):
+        """
+        closes the pooled connections of the transport
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        if self.mirror is not None:
+            self.mirror.flush()
+        await self.transport.close()
+
+    async def authorize(self, code):
+        token = self.decode(await self.get_authorization(code))['access_token']
+        user = (await self._request_json("users/me", {'access_token': token}))['user']
+        if self.tokens is not None:
+            self.tokens.set(user['id'], token)
+        return self._view(self, token, user['id'])
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def make_request(self, path, data, idempotent=True):
+        """
+        snapshots the payload and returns an awaitable for the response
+        """
+        call = self._prepare(path, self._url(path), self._params(data))
+        call.idempotent = idempotent
+        return self._send(call)
+
+    async def _send(self, call):
+        if call.cached is not None:
+            return call.cached
+        if self.single_flight is not None:
+            return await self.single_flight.do_async(call.key, lambda: self._fetch(call))
+        return await self._fetch(call)
+
+    async def _fetch(self, call):
+        attempt, start = 0, time.time()
+        while True:
+            try:
+                req = await self._attempt(call)
+            except getattr(self.transport, 'errors', ()):
+                delay = self._retry_delay(call, attempt, start)
+                if delay is None:
+                    raise
+            else:
+                delay = self._retry_delay(call, attempt, start, req)
+                if delay is None:
+                    return self._complete(call, req)
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def _attempt(self, call):
+        if self.rate_limiter is not None:
+            await self.rate_limiter.acquire_async(self.client_id, call.payload.get('access_token'))
+        start = time.perf_counter()
+        try:
+            req = await self.transport.get(call.url, params=call.payload, headers=call.headers)
+        except Exception as error:
+            self._failed(call, error, start)
+            raise
+        self._after(call, req, start)
+        if self.rate_limiter is not None:
+            self.rate_limiter.update(self.client_id, call.payload.get('access_token'), req.headers)
+        return req
+
+    def _request_json(self, path, data):
+        return self._json(self.make_request(path, data))
+
+    def _request_exists(self, path, data):
+        return self._exists(self.make_request(path, data))
+
+    async def _json(self, pending):
+        return self.decode(await pending)
+
+    async def _exists(self, pending):
+        return (await pending).status_code == 200
+
+    async def stream_items(self, path, data, key="items"):
+        """
+        async generator counterpart of API.stream_items, use with "async for"
+        """
+        call = _Call(path, self._url(path), self._params(data))
+        self._before(path, call.payload)
+        if self.rate_limiter is not None:
+            await self.rate_limiter.acquire_async(self.client_id, call.payload.get('access_token'))
+        parser = ItemParser(key)
+        start = time.perf_counter()
+        size = 0
+        try:
+            stream = self.transport.stream(call.url, params=call.payload)
+            async for chunk in stream:
+                size += len(chunk)
+                for item in parser.feed(chunk):
+                    yield item
+                if parser.done:
+                    await stream.aclose() # unlike a generator, async for leaves it open
+                    break
+            parser.close()
+        except Exception as error:
+            self._failed(call, error, start)
+            raise
+        self._after(call, StoredResponse(call.url, 200, {}, b""), start, size)
+
+    async def _hydrate(self, table, object_id, parts, timeout, timeouts):
+        parts = list(table) if parts is None else parts
+        timeouts = timeouts or {}
+        slots = asyncio.Semaphore(self.max_workers)
+
+        async def run(part):
+            async with slots:
+                body = await getattr(self, table[part])(object_id)
+            return self._part_body(body)
+
+        outcomes = await asyncio.gather(*[
+            asyncio.wait_for(run(part), timeouts.get(part, timeout)) for part in parts],
+            return_exceptions=True)
+        result = {"errors": {}}
+        for part, outcome in zip(parts, outcomes):
+            if isinstance(outcome, asyncio.TimeoutError):
+                result["errors"][part] = TimeoutError("%s timed out" % part)
+            elif isinstance(outcome, Exception):
+                result["errors"][part] = outcome
+            else:
+                result[part] = outcome
+        return result
+
+    async def _fetch_many(self, ids, path, batch_method, single_method, single_key, kwargs):
+        ids = list(ids)
+        unique = _dedupe(ids)
+        found, missing = _found(unique, await asyncio.gather(*[
+            self._fetch_batch(batch_method, batch, kwargs)
+            for batch in self._batches(path, unique, kwargs)]))
+        singles = await asyncio.gather(*[
+            self._fetch_single(single_method, single_key, i, kwargs) for i in missing])
+        return _in_order(ids, found, missing, singles)
+
+    async def _fetch_batch(self, batch_method, batch, kwargs):
+        return self._batch_items(
+            await batch_method(ids=",".join(str(i) for i in batch), limit=len(batch), **kwargs))
+
+    async def _fetch_single(self, single_method, single_key, i, kwargs):
+        return self._single_item(await single_method(i, **kwargs), single_key)
+
+    async def _members_many(self, path, ids, kwargs, listed=True):
+        ids = list(ids)
+        unique = _dedupe(ids)
+        members = await self._member_set(path, kwargs) if listed and unique else None
+        if members is None:
+            members = _existing(unique, await asyncio.gather(*[
+                self._request_exists("%s/%d" %(path, int(i)), kwargs) for i in unique]))
+        return [str(i) in members for i in ids]
+
+    async def _member_set(self, path, kwargs):
+        key, members = self._indexed_members(path, kwargs)
+        if members is not None:
+            return members
+        first = await self._member_page(path, 0, kwargs)
+        offsets = self._member_offsets(first)
+        if offsets is None:
+            return None
+        rest = await asyncio.gather(*[self._member_page(path, offset, kwargs) for offset in offsets])
+        return self._index_members(key, first, rest)
+
+    async def _member_page(self, path, offset, kwargs):
+        return self._listing(await self.make_request(path, _member_params(kwargs, offset)))
+
+    async def _iterate(self, method, args, kwargs):
+        """
+        async generator counterpart of API._iterate, use with "async for"
+        """
+        kwargs = dict(kwargs)
+        limit = kwargs.pop('limit', PAGE_LIMIT)
+        offset = kwargs.pop('offset', 0)
+
+        async def fetch(offset):
+            return self._paged(await method(*args, limit=limit, offset=offset, **kwargs))
+
+        pending = asyncio.ensure_future(fetch(offset))
+        try:
+            while True:
+                items, page_limit, total = await pending
+                offset += len(items)
+                last = _last_page(items, page_limit, limit, offset, total)
+                if not last:
+                    pending = asyncio.ensure_future(fetch(offset))
+                for item in items:
+                    yield item
+                if last:
+                    return
+        finally:
+            pending.cancel()
+
+
+class _View(object):
+    """
+    per-user view of a client: the token and user id are its own, every
+    other attribute is looked up on the client it was created from
+    """
+    def __init__(self, api, access_token, user_id=None):
+        self._api = api
+        self.access_token = access_token
+        self.user_id = user_id
+
+    def __getattr__(self, name):
+        if name == "_api":
+            raise AttributeError(name)
+        return getattr(self._api, name)
+
+    def __repr__(self):
+        return "<%s user_id=%r>" % (type(self).__name__, self.user_id)
+
+    def _params(self, data):
+        params = dict(self.base_payload)
+        params['access_token'] = self.access_token
+        params.update(data)
+        return params
+
+    def _pool(self):
+        return self._api._pool()
+
+    def as_user(self, access_token, user_id=None):
+        return self._api.as_user(access_token, user_id)
+
+    def for_user(self, user_id):
+        return self._api.for_user(user_id)
+
+
+class UserView(_View, API):
+    """
+    API bound to one user's access token, see API.as_user
+    """
+    def close(self):
+        """
+        a view owns no connections, close the client it came from instead
+        """
+
+
+class AsyncUserView(_View, AsyncAPI):
+    """
+    AsyncAPI bound to one user's access token, see API.as_user
+    """
+    async def close(self):
+        """
+        a view owns no connections, close the client it came from instead
+        """
+
+
+API._view = UserView
+AsyncAPI._view = AsyncUserView
+
+
+class TokenStore(object):
+    """
+    Access tokens of many users, keyed by user id, on top of a key -> value
+    store. Tokens are kept in memory once read, so switching between users
+    doesn't touch the store.
+
+    Optional arguments:
+        store = MemoryStore() (SQLiteStore(path, table="tokens") to keep them across runs)
+
+        api = eyeem.API(..., tokens=eyeem.TokenStore(eyeem.SQLiteStore("tokens.db", "tokens")))
+        user_api = api.authorize(code)   # after the oauth callback
+        api.for_user(user_id).user_feed(user_id)
+    """
+    def __init__(self, store=None):
+        self.store = store or MemoryStore()
+        self._tokens = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        key = str(user_id)
+        token = self._tokens.get(key)
+        if token is None:
+            token = self.store.get("token:%s" % key)
+            if token is not None:
+                with self._lock:
+                    self._tokens[key] = token
+        return token
+
+    def set(self, user_id, access_token):
+        key = str(user_id)
+        self.store.set("token:%s" % key, access_token)
+        with self._lock:
+            self._tokens[key] = access_token
+
+    def delete(self, user_id):
+        """
+        forgets the token of a user, e.g. when it was revoked
+        """
+        key = str(user_id)
+        self.store.delete("token:%s" % key)
+        with self._lock:
+            self._tokens.pop(key, None)
+
+
+def _convert(value, kind):
+    if value is None or value == "":
+        return None
+    if kind is bool:
+        return value in (True, 1, "1", "true")
+    try:
+        return kind(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class Model(object):
+    """
+    Base of the compact typed records. A model keeps only the fields listed
+    in FIELDS, as (attribute, key in the API object, type), in __slots__;
+    the rest of the payload is dropped. Nested keys are written "user.id".
+
+        photos = eyeem.Photo.from_response(api.album_photos(album_id))
+        for photo in photos: # parsed one by one as the loop advances
+            print(photo.id, photo.user_id)
+
+    Model.only(...) derives a record type with fewer fields:
+
+        PhotoRef = eyeem.Photo.only("id", "user_id")
+    """
+    __slots__ = ()
+    FIELDS = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super(Model, cls).__init_subclass__(**kwargs)
+        cls._paths = tuple((name, tuple(key.split(".")), kind) for name, key, kind in cls.FIELDS)
+
+    @classmethod
+    def from_dict(cls, data):
+        record = cls.__new__(cls)
+        for name, path, kind in cls._paths:
+            value = data
+            for key in path:
+                value = value.get(key) if isinstance(value, dict) else None
+            setattr(record, name, _convert(value, kind))
+        return record
+
+    @classmethod
+    def iter_items(cls, body):
+        """
+        lazily yields a record per item of a paged body, e.g. {"photos": {"items": [...]}},
+        or of a plain list of objects
+        """
+        items = body if isinstance(body, list) else _page(body)[0]
+        for item in items:
+            yield cls.from_dict(item)
+
+    @classmethod
+    def from_response(cls, response):
+        """
+        lazily yields the records of a paged response
+        """
+        return cls.iter_items(response.json())
+
+    @classmethod
+    def only(cls, *names):
+        """
+        a record type with only the given fields of this one
+        """
+        fields = tuple(field for field in cls.FIELDS if field[0] in names)
+        return type(cls.__name__, (Model,), {'__slots__': tuple(f[0] for f in fields),
+                                             'FIELDS': fields})
+
+    def to_dict(self):
+        return dict((name, getattr(self, name)) for name, _, _ in self.FIELDS)
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return "%s(%s)" % (type(self).__name__, ", ".join(
+            "%s=%r" % (name, getattr(self, name)) for name, _, _ in self.FIELDS[:3]))
+
+
+class Photo(Model):
+    FIELDS = (
+        ("id", "id", int),
+        ("title", "title", str),
+        ("caption", "caption", str),
+        ("width", "width", int),
+        ("height", "height", int),
+        ("updated", "updated", str),
+        ("photo_url", "photoUrl", str),
+        ("thumb_url", "thumbUrl", str),
+        ("latitude", "latitude", float),
+        ("longitude", "longitude", float),
+        ("total_likes", "totalLikes", int),
+        ("total_comments", "totalComments", int),
+        ("user_id", "user.id", int),
+    )
+    __slots__ = tuple(field[0] for field in FIELDS)
+
+
+class Album(Model):
+    FIELDS = (
+        ("id", "id", int),
+        ("name", "name", str),
+        ("type", "type", str),
+        ("updated", "updated", str),
+        ("thumb_url", "thumbUrl", str),
+        ("total_photos", "totalPhotos", int),
+        ("total_contributors", "totalContributors", int),
+        ("total_likers", "totalLikers", int),
+    )
+    __slots__ = tuple(field[0] for field in FIELDS)
+
+
+class User(Model):
+    FIELDS = (
+        ("id", "id", int),
+        ("nickname", "nickname", str),
+        ("fullname", "fullname", str),
+        ("description", "description", str),
+        ("thumb_url", "thumbUrl", str),
+        ("photo_url", "photoUrl", str),
+        ("total_photos", "totalPhotos", int),
+        ("total_followers", "totalFollowers", int),
+        ("total_friends", "totalFriends", int),
+        ("total_liked_photos", "totalLikedPhotos", int),
+    )
+    __slots__ = tuple(field[0] for field in FIELDS)
+
+
+class Comment(Model):
+    FIELDS = (
+        ("id", "id", int),
+        ("photo_id", "photoId", int),
+        ("message", "message", str),
+        ("updated", "updated", str),
+        ("user_id", "user.id", int),
+    )
+    __slots__ = tuple(field[0] for field in FIELDS)
+
+
+class NewsItem(Model):
+    FIELDS = (
+        ("id", "id", int),
+        ("news_type", "newsType", str),
+        ("updated", "updated", str),
+        ("seen", "seen", bool),
+        ("user_id", "user.id", int),
+        ("photo_id", "photo.id", int),
+        ("album_id", "album.id", int),
+    )
+    __slots__ = tuple(field[0] for field in FIELDS)
+
+
+
+class IdSet(object):
+    """
+    Set of non-negative integer ids stored as a bitmap: one bit per
+    possible id, about 1.2 MB per ten million ids.
+    """
+    __slots__ = ('_bits', '_count')
+
+    def __init__(self, bits=b"", count=0):
+        self._bits = bytearray(bits)
+        self._count = count
+
+    def add(self, i):
+        """
+        adds an id, returns False if it was already in the set
+        """
+        byte, bit = i >> 3, 1 << (i & 7)
+        if byte >= len(self._bits):
+            self._bits.extend(bytes(max(byte + 1, 2 * len(self._bits)) - len(self._bits)))
+        if self._bits[byte] & bit:
+            return False
+        self._bits[byte] |= bit
+        self._count += 1
+        return True
+
+    def __contains__(self, i):
+        byte = i >> 3
+        return byte < len(self._bits) and bool(self._bits[byte] & (1 << (i & 7)))
+
+    def __len__(self):
+        return self._count
+
+    def to_bytes(self):
+        return bytes(self._bits)
+
+
+# edges the crawler can follow: kind -> (API method, paged)
+CRAWL_EDGES = {
+    "followers": ("iter_user_followers", True),
+    "friends": ("iter_user_friends", True),
+    "suggestions": ("user_follow_suggestions", False),
+}
+
+_crawler_api = None
+
+
+def _crawler_init(client_id, client_secret, api_url, rate_limits, buckets_path):
+    """
+    builds the API of a crawler worker process, sharing the rate limiter through a file
+    """
+    global _crawler_api
+    limiter = RateLimiter(buckets=FileBuckets(buckets_path), **rate_limits)
+    _crawler_api = API(client_id, client_secret, None, "error", rate_limiter=limiter,
+                       retry=RetryPolicy())
+    _crawler_api.api_url = api_url
+
+
+def _crawl_user(user_id, kinds, access_token):
+    """
+    returns (user_id, {kind: [neighbor ids]}) for one user, runs in a worker process
+    """
+    params = {'access_token': access_token} if access_token else {}
+    neighbors = {}
+    for kind in kinds:
+        method, paged = CRAWL_EDGES[kind]
+        if paged:
+            items = getattr(_crawler_api, method)(user_id, onlyId=1, **params)
+        else:
+            response = getattr(_crawler_api, method)(user_id, **params)
+            items = _page(_crawler_api.decode(response))[0] if response.status_code == 200 else []
+        neighbors[kind] = [int(item['id'] if isinstance(item, dict) else item) for item in items]
+    return user_id, neighbors
+
+
+class GraphCrawler(object):
+    """
+    Breadth-first crawler over the follower/friend graph, spread over
+    worker processes that share one rate limiter.
+
+    Required arguments:
+        client_id
+        client_secret
+        seeds (user ids to start from)
+
+    Optional arguments:
+        depth = 2 (hops from the seeds)
+        edges = ("followers", "friends") (kinds of CRAWL_EDGES to follow)
+        processes = 4
+        access_token = None
+        checkpoint = None (file the state is saved to every checkpoint_every users,
+                           an existing one is resumed from)
+        checkpoint_every = 1000
+        rate_limits = {} (RateLimiter arguments, e.g. {"client_rate": 20})
+        api_url = API_URL
+
+        crawler = eyeem.GraphCrawler(CLIENT_ID, CLIENT_SECRET, [1234], depth=2, checkpoint="crawl.json")
+        stats = crawler.run(on_user=lambda user_id, neighbors: ...)
+    """
+    def __init__(self, client_id, client_secret, seeds, depth=2, edges=("followers", "friends"),
+                 processes=4, access_token=None, checkpoint=None, checkpoint_every=1000,
+                 rate_limits=None, api_url=API_URL):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.depth = depth
+        self.edges = tuple(edges)
+        self.processes = processes
+        self.access_token = access_token
+        self.checkpoint = checkpoint
+        self.checkpoint_every = checkpoint_every
+        self.rate_limits = rate_limits or {}
+        self.api_url = api_url
+        self.visited = IdSet()
+        self.frontier = deque()
+        self.users = 0
+        self.failed = 0
+        self.edge_count = 0
+        self.elapsed = 0.0
+        if checkpoint and os.path.exists(checkpoint):
+            self._load()
+        else:
+            for seed in seeds:
+                if self.visited.add(int(seed)):
+                    self.frontier.append((int(seed), 0))
+
+    def run(self, on_user=None):
+        """
+        crawls until the frontier is empty, calling on_user(user_id, {kind: [ids]})
+        for every user. A user whose listings fail (deleted, private) is counted
+        in the "failed" stat and skipped. Returns the stats.
+        """
+        from concurrent.futures import ProcessPoolExecutor
+        import tempfile
+        buckets = tempfile.NamedTemporaryFile(prefix="eyeem-buckets-", delete=False)
+        buckets.close()
+        in_flight = {}
+        started = time.time() - self.elapsed
+        since_checkpoint = 0
+        try:
+            with ProcessPoolExecutor(self.processes, initializer=_crawler_init, initargs=(
+                    self.client_id, self.client_secret, self.api_url, self.rate_limits,
+                    buckets.name)) as pool:
+                while self.frontier or in_flight:
+                    while self.frontier and len(in_flight) < 2 * self.processes:
+                        user_id, hops = self.frontier.popleft()
+                        future = pool.submit(_crawl_user, user_id, self.edges, self.access_token)
+                        in_flight[future] = (user_id, hops)
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        user_id, hops = in_flight.pop(future)
+                        try:
+                            neighbors = future.result()[1]
+                        except BrokenExecutor:
+                            raise
+                        except Exception as error:
+                            self.failed += 1
+                            logger.warning("crawling user %s failed: %s", user_id, error)
+                            continue
+                        self._expand(hops, neighbors)
+                        if on_user is not None:
+                            on_user(user_id, neighbors)
+                        since_checkpoint += 1
+                    self.elapsed = time.time() - started
+                    if self.checkpoint and since_checkpoint >= self.checkpoint_every:
+                        self._save(in_flight.values())
+                        since_checkpoint = 0
+                        logger.info("crawled %d users, %.1f users/s", self.users,
+                                    self.users / max(self.elapsed, 1e-9))
+            if self.checkpoint:
+                self._save(())
+        finally:
+            os.remove(buckets.name)
+        return self.stats()
+
+    def _expand(self, hops, neighbors):
+        self.users += 1
+        for ids in neighbors.values():
+            self.edge_count += len(ids)
+            if hops < self.depth:
+                for i in ids:
+                    if self.visited.add(i):
+                        self.frontier.append((i, hops + 1))
+
+    def stats(self):
+        return {"users": self.users, "failed": self.failed, "edges": self.edge_count,
+                "visited": len(self.visited), "frontier": len(self.frontier), "elapsed": self.elapsed,
+                "users_per_second": self.users / self.elapsed if self.elapsed else 0.0}
+
+    def _save(self, in_flight):
+        """
+        writes the state atomically; users in flight go back to the frontier
+        """
+        state = {
+            "depth": self.depth, "edges": self.edges, "users": self.users, "failed": self.failed,
+            "edge_count": self.edge_count, "elapsed": self.elapsed,
+            "frontier": list(in_flight) + list(self.frontier),
+            "visited": base64.b64encode(zlib.compress(self.visited.to_bytes())).decode("ascii"),
+            "visited_count": len(self.visited),
+        }
+        partial = self.checkpoint + ".tmp"
+        with open(partial, "w") as f:
+            json.dump(state, f)
+        os.replace(partial, self.checkpoint)
+
+    def _load(self):
+        with open(self.checkpoint) as f:
+            state = json.load(f)
+        self.users = state["users"]
+        self.failed = state.get("failed", 0)
+        self.edge_count = state["edge_count"]
+        self.elapsed = state["elapsed"]
+        self.frontier = deque(tuple(entry) for entry in state["frontier"])
+        self.visited = IdSet(zlib.decompress(base64.b64decode(state["visited"])),
+                             state["visited_count"])
+
+
+
+class MemoryStore(object):
+    """
+    Key -> JSON-able value store kept in memory, for sync cursors and indexes.
+    """
+    def __init__(self):
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            return self._values.get(key, default)
+
+    def set(self, key, value):
+        with self._lock:
+            self._values[key] = value
+
+    def delete(self, key):
+        with self._lock:
+            self._values.pop(key, None)
+
+
+class SQLiteStore(object):
+    """
+    Key -> JSON-able value store persisted in SQLite, for sync cursors and indexes.
+    The file is created readable by its owner only, as it may hold access tokens.
+
+    Required arguments:
+        path (sqlite database file)
+
+    Optional arguments:
+        table = "state"
+    """
+    def __init__(self, path, table="state"):
+        self.table = table
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.close(os.open(path, os.O_RDWR | os.O_CREAT, 0o600))
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("CREATE TABLE IF NOT EXISTS %s (key TEXT PRIMARY KEY, value TEXT)" % table)
+
+    def get(self, key, default=None):
+        with self._lock:
+            row = self._db.execute("SELECT value FROM %s WHERE key = ?" % self.table,
+                                   (key,)).fetchone()
+        return default if row is None else json.loads(row[0])
+
+    def set(self, key, value):
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO %s VALUES (?, ?)" % self.table,
+                             (key, json.dumps(value)))
+
+    def delete(self, key):
+        with self._lock:
+            self._db.execute("DELETE FROM %s WHERE key = ?" % self.table, (key,))
+
+
+def _item_id(item):
+    return int(item['id'] if isinstance(item, dict) else item)
+
+
+class NewsSync(object):
+    """
+    Incremental sync of users' news. The newest and oldest news id seen
+    are kept per access token, so a poll asks only for items newer than
+    the last one seen (one small request when nothing happened) and older
+    history is backfilled on demand.
+
+    Required arguments:
+        api
+
+    Optional arguments:
+        store = MemoryStore() (SQLiteStore(path) to keep the cursors across runs)
+        limit = 30 (page size)
+        max_pages = 10 (pages fetched per poll when many items are new, items
+                        beyond them are skipped)
+
+        sync = eyeem.NewsSync(api, eyeem.SQLiteStore("news.db"))
+        new_items = sync.poll(access_token)
+        by_token = sync.poll_all(access_tokens)
+    """
+    def __init__(self, api, store=None, limit=30, max_pages=10):
+        self.api = api
+        self.store = store or MemoryStore()
+        self.limit = limit
+        self.max_pages = max_pages
+
+    def _key(self, access_token):
+        # cursors are stored under a digest, not the token itself
+        return "news:" + _digest(access_token)
+
+    def cursor(self, access_token):
+        """
+        {"newest": id, "oldest": id, "exhausted": bool} or None before the first poll
+        """
+        return self.store.get(self._key(access_token))
+
+    def _fetch(self, access_token, **cursor):
+        response = self.api.news(limit=self.limit, access_token=access_token, **cursor)
+        if response.status_code != 200:
+            raise APIError(response)
+        return _page(self.api.decode(response))[0]
+
+    def poll(self, access_token):
+        """
+        returns the news items newer than the last poll (the latest page on the first poll)
+        """
+        state = self.cursor(access_token)
+        if state is None:
+            items = self._fetch(access_token)
+            ids = [_item_id(item) for item in items]
+            state = {"newest": max(ids) if ids else 0, "oldest": min(ids) if ids else 0,
+                     "exhausted": len(items) < self.limit}
+            self.store.set(self._key(access_token), state)
+            return items
+        # a full page holds only the latest items: walk down to the last poll
+        # before moving the cursor, so the ones in between are not skipped
+        mark, below = state["newest"], None
+        fresh = []
+        for _ in range(self.max_pages):
+            cursor = {"newestId": mark} if below is None else {"newestId": mark, "oldestId": below}
+            page = self._fetch(access_token, **cursor)
+            items = [item for item in page if _item_id(item) > mark
+                     and (below is None or _item_id(item) < below)]
+            fresh.extend(items)
+            if not items or len(items) < len(page) or len(page) < self.limit:
+                break
+            below = min(_item_id(item) for item in items)
+        if fresh:
+            ids = [_item_id(item) for item in fresh]
+            state["newest"] = max(ids)
+            if not state["oldest"]:
+                state["oldest"] = min(ids)
+            self.store.set(self._key(access_token), state)
+        return fresh
+
+    def backfill(self, access_token, pages=1):
+        """
+        returns up to pages pages of items older than anything seen so far
+        """
+        state = self.cursor(access_token)
+        if state is None:
+            return self.poll(access_token)
+        older = []
+        for _ in range(pages):
+            if state["exhausted"] or not state["oldest"]:
+                break
+            items = self._fetch(access_token, oldestId=state["oldest"])
+            items = [item for item in items if _item_id(item) < state["oldest"]]
+            older.extend(items)
+            if items:
+                state["oldest"] = min(_item_id(item) for item in items)
+            state["exhausted"] = len(items) < self.limit
+        self.store.set(self._key(access_token), state)
+        return older
+
+    def poll_all(self, access_tokens):
+        """
+        polls many users concurrently on the API's thread pool,
+        returns {access_token: new items}; a failed poll maps to its exception
+        """
+        access_tokens = list(access_tokens)
+        futures = [self.api._pool().submit(self.poll, token) for token in access_tokens]
+        results = {}
+        for token, future in zip(access_tokens, futures):
+            try:
+                results[token] = future.result()
+            except Exception as e:
+                results[token] = e
+        return results
+
+
+class AlbumSync(object):
+    """
+    Incremental sync of album photos. Keeps a cursor (the newest photo id)
+    and the index of photo ids of every album, lists only ids (onlyId=1)
+    to find changes and fetches full details only for new photos.
+
+    Required arguments:
+        api
+
+    Optional arguments:
+        store = MemoryStore() (SQLiteStore(path) to keep the indexes across runs)
+        on_added = None (called as on_added(album_id, photo) for every new photo)
+        on_removed = None (called as on_removed(album_id, photo_id) for every removed photo)
+        limit = 100 (page size of the id listings)
+
+        sync = eyeem.AlbumSync(api, eyeem.SQLiteStore("albums.db"), on_added=index_photo)
+        sync.sync_all(city_album_ids) # new photos since the last sync, via after=
+        sync.reconcile(album_id)      # full id diff, also finds removed photos
+    """
+    def __init__(self, api, store=None, on_added=None, on_removed=None, limit=100, **photo_options):
+        self.api = api
+        self.store = store or MemoryStore()
+        self.on_added = on_added
+        self.on_removed = on_removed
+        self.limit = limit
+        self.photo_options = photo_options
+
+    def _key(self, album_id):
+        return "album:%s" % album_id
+
+    def state(self, album_id):
+        """
+        {"cursor": newest photo id, "ids": [photo ids]} or None before the first sync
+        """
+        return self.store.get(self._key(album_id))
+
+    def _list_ids(self, album_id, **cursor):
+        return set(_item_id(item) for item in self.api.iter_album_photos(
+            album_id, onlyId=1, limit=self.limit, **cursor))
+
+    def sync(self, album_id):
+        """
+        picks up the photos added since the last sync (a full reconcile the first time).
+        returns {"added": [photos], "removed": [photo ids]}
+        """
+        state = self.state(album_id)
+        if state is None:
+            return self.reconcile(album_id)
+        known = set(state["ids"])
+        added = self._list_ids(album_id, after=state["cursor"]) - known
+        return self._apply(album_id, known, added, set())
+
+    def reconcile(self, album_id):
+        """
+        diffs the full id listing against the index, finding added and removed photos.
+        returns {"added": [photos], "removed": [photo ids]};
+        a failed listing page raises APIError before the index is touched
+        """
+        state = self.state(album_id)
+        known = set(state["ids"]) if state else set()
+        current = self._list_ids(album_id)
+        return self._apply(album_id, known, current - known, known - current)
+
+    def _apply(self, album_id, known, added, removed):
+        photos = [photo for photo in self.api.fetch_photos(sorted(added), **self.photo_options)
+                  if photo is not None] if added else []
+        # photos that could not be fetched stay out of the index, the next sync retries them
+        ids = (known | set(_item_id(photo) for photo in photos)) - removed
+        self.store.set(self._key(album_id), {"cursor": max(ids) if ids else 0, "ids": sorted(ids)})
+        if self.on_added is not None:
+            for photo in photos:
+                self.on_added(album_id, photo)
+        if self.on_removed is not None:
+            for photo_id in sorted(removed):
+                self.on_removed(album_id, photo_id)
+        return {"added": photos, "removed": sorted(removed)}
+
+    def sync_all(self, album_ids, reconcile=False, workers=4):
+        """
+        syncs many albums concurrently, returns {album_id: result};
+        a failed sync maps to its exception
+        """
+        album_ids = list(album_ids)
+        method = self.reconcile if reconcile else self.sync
+        # a pool of its own: the syncs submit their page and batch fetches to the API's pool
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(method, album_id) for album_id in album_ids]
+        results = {}
+        for album_id, future in zip(album_ids, futures):
+            try:
+                results[album_id] = future.result()
+            except Exception as e:
+                results[album_id] = e
+        return results
+
+
+
+class Mirror(object):
+    """
+    Write-through SQLite mirror of every photo, album and user the client
+    receives, indexed by id, user, album and update time. Plugged into an
+    API with mirror=, it lets get_photo_by_id, get_album_by_id and
+    user_by_id answer from disk while a record is fresher than
+    mirror_max_age. Only records that same call fetched without an access
+    token or options are served that way; entities seen nested in other
+    responses or fetched with a token are indexed but never answer a call.
+    Rows are written in batches, one transaction each.
+
+    Required arguments:
+        path (sqlite database file)
+
+    Optional arguments:
+        batch_size = 500 (entities queued before a write)
+        flush_interval = 1.0 (seconds before queued entities are written anyway)
+
+        api = eyeem.API(..., mirror=eyeem.Mirror("eyeem.db"), mirror_max_age=600)
+        api.mirror.photos_by_user(user_id)
+    """
+    def __init__(self, path, batch_size=500, flush_interval=1.0):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.written = 0
+        self._pending = {"photo": {}, "album": {}, "user": {}}
+        self._links = set()
+        self._flushed = time.time()
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS photos (id INTEGER PRIMARY KEY, user_id INTEGER,
+                updated TEXT, fetched REAL, complete INTEGER, data TEXT);
+            CREATE TABLE IF NOT EXISTS albums (id INTEGER PRIMARY KEY, updated TEXT,
+                fetched REAL, complete INTEGER, data TEXT);
+            CREATE TABLE IF NOT EXISTS users (id INTEGER PRIMARY KEY, fetched REAL,
+                complete INTEGER, data TEXT);
+            CREATE TABLE IF NOT EXISTS album_photos (album_id INTEGER, photo_id INTEGER,
+                PRIMARY KEY (album_id, photo_id)) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS photos_user ON photos (user_id);
+            CREATE INDEX IF NOT EXISTS photos_updated ON photos (updated);
+            CREATE INDEX IF NOT EXISTS albums_updated ON albums (updated);
+            CREATE INDEX IF NOT EXISTS album_photos_photo ON album_photos (photo_id);
+        """)
+
+    def record(self, path, body, payload=None):
+        """
+        queues the entities of a decoded response body of path requested with payload
+        """
+        endpoint = _endpoint(path)
+        album_id = None
+        if endpoint == "albums/%d/photos":
+            album_id = int(path.strip("/").split("/")[1])
+        # the entity get_photo_by_id & co. fetched without token or options is complete
+        complete = MIRRORED_ENDPOINTS.get(endpoint)
+        if complete is not None and set(payload or {}) - set(('client_id',)):
+            complete = None
+        with self._lock:
+            self._collect(body, time.time(), album_id, True, complete)
+            queued = sum(len(rows) for rows in self._pending.values()) + len(self._links)
+            if queued >= self.batch_size or time.time() - self._flushed >= self.flush_interval:
+                self.flush()
+
+    def _collect(self, value, now, album_id, top, complete=None):
+        if isinstance(value, list):
+            for child in value:
+                self._collect(child, now, album_id, top)
+            return
+        if not isinstance(value, dict):
+            return
+        for key, child in value.items():
+            kind = ENTITY_KEYS.get(key)
+            if kind is None:
+                self._collect(child, now, None, top)
+                continue
+            single = not (isinstance(child, dict) and 'items' in child)
+            items = [child] if single else child.get('items')
+            for item in items if isinstance(items, list) else ():
+                if isinstance(item, dict) and 'id' in item:
+                    self._queue(kind, item, now, top, top and single and key == complete)
+                    if kind == "photo" and album_id is not None:
+                        self._links.add((album_id, int(item['id'])))
+                    self._collect(item, now, int(item['id']) if kind == "album" else None, False)
+
+    def _queue(self, kind, item, now, replace, complete=False):
+        """
+        top-level entities replace the stored row, nested (often abridged) ones only fill gaps
+        """
+        object_id = int(item['id'])
+        pending = self._pending[kind]
+        if not replace and object_id in pending:
+            return
+        if kind == "photo":
+            user = item.get('user')
+            user_id = int(user['id']) if isinstance(user, dict) and 'id' in user else None
+            row = (object_id, user_id, item.get('updated'), now, complete, json.dumps(item))
+        elif kind == "album":
+            row = (object_id, item.get('updated'), now, complete, json.dumps(item))
+        else:
+            row = (object_id, now, complete, json.dumps(item))
+        pending[object_id] = (replace, row)
+
+    def flush(self):
+        """
+        writes the queued entities in one transaction
+        """
+        with self._lock:
+            statements = (
+                ("photos", "photo", "(?, ?, ?, ?, ?, ?)"),
+                ("albums", "album", "(?, ?, ?, ?, ?)"),
+                ("users", "user", "(?, ?, ?, ?)"),
+            )
+            self._db.execute("BEGIN")
+            try:
+                for table, kind, values in statements:
+                    rows = self._pending[kind].values()
+                    for verb, replace in (("INSERT OR REPLACE", True), ("INSERT OR IGNORE", False)):
+                        self._db.executemany("%s INTO %s VALUES %s" % (verb, table, values),
+                                             [row for flag, row in rows if flag is replace])
+                    self.written += len(rows)
+                self._db.executemany("INSERT OR IGNORE INTO album_photos VALUES (?, ?)", self._links)
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+            for rows in self._pending.values():
+                rows.clear()
+            self._links.clear()
+            self._flushed = time.time()
+
+    def get(self, kind, object_id, max_age=None, complete=False):
+        """
+        the stored record of a "photo", "album" or "user", None if missing or older than max_age.
+        With complete=True only records fetched by their own endpoint without a token qualify.
+        """
+        table = {"photo": "photos", "album": "albums", "user": "users"}[kind]
+        with self._lock:
+            pending = self._pending[kind].get(object_id)
+            if pending is not None and pending[0]:
+                row = pending[1][-3:]
+            else:
+                row = self._db.execute("SELECT fetched, complete, data FROM %s WHERE id = ?" % table,
+                                       (object_id,)).fetchone()
+        if row is None or (complete and not row[1]):
+            return None
+        if max_age is not None and time.time() - row[0] > max_age:
+            return None
+        return json.loads(row[2])
+
+    def photos_by_user(self, user_id, limit=100):
+        """
+        stored photos of a user, most recently updated first
+        """
+        self.flush()
+        rows = self._db.execute("SELECT data FROM photos WHERE user_id = ? ORDER BY updated DESC "
+                                "LIMIT ?", (user_id, limit)).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def photos_in_album(self, album_id, limit=100):
+        """
+        stored photos seen in an album, most recently updated first
         """
-        path = "venues/search"
-        payload = self.base_payload
-        for k, v in kwargs.iteritems():
-            payload[k] = v
-        return self.make_request(path, payload)
\ No newline at end of file
+        self.flush()
+        rows = self._db.execute("SELECT photos.data FROM album_photos JOIN photos "
+                                "ON photos.id = album_photos.photo_id WHERE album_id = ? "
+                                "ORDER BY photos.updated DESC LIMIT ?", (album_id, limit)).fetchall()
+        return [json.loads(row[0]) for row in rows]
@@ -0,0 +1,112 @@
+import json
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import eyeem
+
+
+BODIES = [
+    '{"photos":{"offset":0,"limit":3,"total":3,"items":[12345,67890,-2E-5]}}',
+    '{"items": [1.5e3, true, null, false, {"a": 1}, "x", [1, [2]], 0 ]}',
+    '{"title": "\\"items\\": [", "items":[{"id":"1","t":"caf\\u00e9 ]}"},{"id":"2","t":"\xe9é"}]}',
+    '{"items":[]}',
+    '{ "items" :\n[ 7 ,\t8\r\n] }',
+]
+
+
+def _feed(parser, chunks):
+    items = []
+    for chunk in chunks:
+        items.extend(parser.feed(chunk))
+    parser.close()
+    return items
+
+
+class ItemParserTest(unittest.TestCase):
+
+    def test_every_split(self):
+        for body in BODIES:
+            data = body.encode("utf-8")
+            expected = json.loads(body)
+            expected = expected.get("photos", expected)["items"]
+            for cut in range(len(data) + 1):
+                items = _feed(eyeem.ItemParser(), [data[:cut], data[cut:]])
+                self.assertEqual(items, expected, "%r cut at %d" % (body, cut))
+
+    def test_byte_by_byte(self):
+        for body in BODIES:
+            data = body.encode("utf-8")
+            expected = json.loads(body)
+            expected = expected.get("photos", expected)["items"]
+            items = _feed(eyeem.ItemParser(), [data[i:i + 1] for i in range(len(data))])
+            self.assertEqual(items, expected, body)
+
+    def test_scalars_wait_for_a_delimiter(self):
+        parser = eyeem.ItemParser()
+        self.assertEqual(parser.feed(b'{"items":[123'), [])
+        self.assertEqual(parser.feed(b'45,1.5'), [12345])
+        self.assertEqual(parser.feed(b'e3,tru'), [1500.0])
+        self.assertEqual(parser.feed(b'e]}'), [True])
+        self.assertTrue(parser.done)
+
+    def test_truncated_body(self):
+        parser = eyeem.ItemParser()
+        parser.feed(b'{"items":[1,2')
+        self.assertRaises(ValueError, parser.close)
+
+    def test_other_key(self):
+        body = b'{"items":[1],"likers":{"items":[2, 3]}}'
+        self.assertEqual(_feed(eyeem.ItemParser("likers"), [body]), [])
+        parser = eyeem.ItemParser()
+        self.assertEqual(parser.feed(body), [1])
+
+
+class DecodePartialTest(unittest.TestCase):
+
+    BODY = json.dumps({
+        "photo": {"id": "1", "title": "a \"quoted\" {brace} [bracket]", "width": 1.5e3,
+                  "user": {"id": "2", "nickname": "café", "photos": [1, {"x": [2, 3]}]},
+                  "tags": [], "public": True, "location": None},
+        "comments": {"total": 2, "items": [{"id": "3", "message": "\\"}, {"id": "4"}]},
+        "skipped": [[[{"deep": "}]"}]]],
+    })
+
+    def check(self, paths, body=BODY):
+        full = json.loads(body)
+        expected = {}
+        for path in paths:
+            source, target = full, expected
+            keys = path.split(".")
+            for key in keys[:-1]:
+                if key not in source:
+                    break
+                source = source[key]
+                target = target.setdefault(key, {})
+            else:
+                if keys[-1] in source:
+                    target[keys[-1]] = source[keys[-1]]
+        for data in (body, body.encode("utf-8"), body.replace(", ", ",\n  ")):
+            self.assertEqual(eyeem.decode_partial(data, paths), expected, paths)
+
+    def test_paths(self):
+        self.check(["photo.id"])
+        self.check(["photo.title", "photo.width", "photo.public", "photo.location"])
+        self.check(["photo.user.nickname", "comments.total"])
+        self.check(["photo.user", "comments.items"])
+        self.check(["skipped"])
+        self.check(["photo.tags", "comments.items"])
+
+    def test_missing_paths(self):
+        self.check(["nothing"])
+        self.check(["photo.nothing.deeper", "comments.total"])
+
+    def test_whitespace(self):
+        self.assertEqual(eyeem.decode_partial(' \n{ "a" : { "b" : [ 1 , 2 ] } , "c" : 3 }\n',
+                                              ["a.b", "c"]), {"a": {"b": [1, 2]}, "c": 3})
+
+
+if __name__ == "__main__":
+    unittest.main()